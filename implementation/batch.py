@@ -0,0 +1,78 @@
+import concurrent.futures
+import hashlib
+import json
+import os
+from instrumentation import run_job
+
+# batch embedding across a process pool, every worker process keeps one initialised Steganography
+# so the config parsing and AES key schedule happen once per worker rather than once per image
+
+_worker_steganography = None
+_worker_tile_rows = None # set when embedding tiled, 0 means the default band size
+
+def _init_worker(config, tile_rows=None):
+    global _worker_steganography, _worker_tile_rows
+    import instrumentation
+    from steganography import Steganography
+    instrumentation.configure_logging() # no-op when the worker inherited the parent's handlers
+    import cache
+    cache.disable_cover_cache() # each cover is read once, a per-process cache would only hold frames in memory
+    _worker_steganography = Steganography(config)
+    _worker_tile_rows = tile_rows
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _embed(cover, payload, output):
+    if _worker_tile_rows is not None: # bounded memory for very large uncompressed covers
+        _worker_steganography.embed_text_tiled(cover, payload, output, tile_rows=_worker_tile_rows or None)
+    else:
+        image = _worker_steganography.embed_text(cover, payload)
+        _worker_steganography.save_image(image, output)
+    return {'sha256': _file_sha256(output)}
+
+def _run_job(job): # runs in the worker
+    cover, payload, output = job
+    result = run_job({'cover': cover, 'output': output, 'payload_bytes': len(payload.encode())}, lambda: _embed(cover, payload, output))
+    result['worker'] = os.getpid()
+    return result
+
+class BatchEmbedder:
+    def __init__(self, config, workers=None, tile_rows=None):
+        self._config = config
+        self._workers = workers or os.cpu_count() or 1
+        self._tile_rows = tile_rows # None embeds in memory, otherwise tiled (0 for the default band size)
+
+    def run(self, jobs, manifest_path=None): # jobs are (cover, payload, output) tuples, returns one result dict per job
+        jobs = [tuple(job) for job in jobs]
+        if not jobs:
+            return []
+        chunksize = max(1, len(jobs) // (self._workers * 8)) # large enough to amortise ipc, small enough to balance load
+        results = []
+        manifest = open(manifest_path, 'w') if manifest_path else None
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self._workers, initializer=_init_worker,
+                                                        initargs=(self._config, self._tile_rows)) as executor:
+                for result in executor.map(_run_job, jobs, chunksize=chunksize):
+                    results.append(result)
+                    if manifest:
+                        manifest.write(json.dumps(result) + '\n') # json lines, written as results arrive
+                        manifest.flush()
+        finally:
+            if manifest:
+                manifest.close()
+        return results
+
+    @staticmethod
+    def load_jobs(file_path): # reads a json lines file of {"cover", "payload", "output"} objects
+        jobs = []
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    job = json.loads(line)
+                    jobs.append((job['cover'], job['payload'], job['output']))
+        return jobs
@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from meth.xsb import SignificantBit
+from meth.pvd import PVDAlgorithm
+from meth.header import PayloadHeader
+from enc.aes import AESAlgorithm, AESTables
+from enc.noise import Noise
+from enc.compression import Compression
+import cache
+
+# reproducible benchmark suite: synthetic covers, fixed seeds, json results that can be diffed between runs
+# usage: python bench.py [--sizes 0.3 1 4] [--output run.json]
+#        python bench.py --compare old.json new.json
+
+DEFAULT_SIZES = (0.3, 1, 4, 12, 24, 50) # megapixels
+DEFAULT_PAYLOADS = (16, 1024, 65536) # bytes, the cover capacity is always added
+COVER_KINDS = ('flat', 'noisy', 'photo')
+AES_KEY = b'benchmarkkey0000'
+AES_IV = b'benchmarkiv00000'
+
+def make_cover(kind, megapixels, seed=0): # deterministic synthetic cover with a 3:2 aspect ratio
+    height = max(2, int((megapixels * 1e6 / 1.5) ** 0.5))
+    width = max(2, int(height * 1.5))
+    rng = np.random.default_rng(seed)
+    if kind == 'flat': # smooth areas, lowest pvd capacity
+        cover = np.full((height, width, 3), 128, dtype=np.uint8)
+        cover[..., 0] = np.linspace(96, 160, width, dtype=np.uint8)
+    elif kind == 'noisy': # uniform noise, highest pvd capacity
+        cover = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    elif kind == 'photo': # gradients plus low frequency structure and sensor-like noise
+        y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+        x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+        cover = np.empty((height, width, 3), dtype=np.uint8)
+        for c in range(3):
+            phase = rng.uniform(0, 2 * np.pi, 2)
+            base = 128 + 60 * np.sin(6 * x + phase[0]) * np.cos(4 * y + phase[1]) + 40 * (x - y)
+            base += rng.normal(0, 4, (height, width)).astype(np.float32)
+            cover[..., c] = np.clip(base, 0, 255).astype(np.uint8)
+    else:
+        raise ValueError(f"Unknown cover kind: {kind}")
+    return Image.fromarray(cover)
+
+def _clear_caches(): # process wide caches (see cache.py), cleared so a timed run pays for decoding and key expansion
+    cache.covers.clear()
+    cache.key_schedules.clear()
+
+def _measure(func, repeat, setup=None): # fastest wall time over repeat runs plus peak traced memory of one run
+    # setup runs untimed before every run, the memory run included
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak, result
+
+def _record(results, name, seconds, peak, cover=None, megapixels=None, payload_bytes=None, **extra):
+    entry = {'name': name, 'cover': cover, 'megapixels': megapixels, 'payload_bytes': payload_bytes,
+             'seconds': round(seconds, 6), 'peak_mb': round(peak / 1e6, 3)}
+    if payload_bytes:
+        entry['mb_per_s'] = round(payload_bytes / 1e6 / seconds, 3) if seconds else None
+    if megapixels:
+        entry['mp_per_s'] = round(megapixels / seconds, 3) if seconds else None
+    entry.update(extra)
+    results.append(entry)
+    print(json.dumps(entry), file=sys.stderr)
+
+def _payloads(capacity, sizes):
+    return sorted({size for size in sizes if size <= capacity} | ({capacity} if capacity > 0 else set()))
+
+def bench_algorithms(results, cover, kind, megapixels, payload_sizes, repeat, backends):
+    rng = np.random.default_rng(1)
+    for name, algorithm in (('xsb', SignificantBit), ('pvd', PVDAlgorithm)):
+        capacity = algorithm.capacity(cover) - PayloadHeader.SIZE
+        for size in _payloads(capacity, payload_sizes):
+            payload = PayloadHeader.frame('X Significant Bit' if name == 'xsb' else 'Pixel Value Differencing',
+                                          rng.integers(0, 256, size, dtype=np.uint8).tobytes())
+            for backend in backends:
+                if name == 'xsb':
+                    embed = lambda: SignificantBit.embed(cover, payload, bit_position=0, backend=backend)
+                else:
+                    embed = lambda: PVDAlgorithm.embed(cover, payload, backend=backend, end_marker=False)
+                seconds, peak, stego = _measure(embed, repeat)
+                _record(results, f'{name}.embed', seconds, peak, kind, megapixels, size, backend=backend)
+            if name == 'xsb':
+                extract = lambda: SignificantBit.read_bytes(stego, len(payload), bit_position=0)
+            else:
+                extract = lambda: PVDAlgorithm.read_bytes(stego, len(payload))
+            seconds, peak, _ = _measure(extract, repeat)
+            _record(results, f'{name}.extract', seconds, peak, kind, megapixels, size)
+
+def bench_noise(results, cover, kind, megapixels, repeat):
+    for level in (1.0, 10.0):
+        seconds, peak, _ = _measure(lambda: Noise.add_noise(cover, level, 0, seed=0), repeat)
+        _record(results, 'noise.add_noise', seconds, peak, kind, megapixels, noise_level=level)
+
+def bench_aes(results, repeat):
+    AESTables._tables = None # time the once-per-process table build explicitly
+    seconds, peak, _ = _measure(AESTables.get, 1)
+    _record(results, 'aes.tables', seconds, peak)
+    seconds, peak, aes = _measure(lambda: AESAlgorithm(AES_KEY), repeat, _clear_caches) # key expansion
+    _record(results, 'aes.key_setup', seconds, peak)
+    seconds, peak, aes = _measure(lambda: AESAlgorithm(AES_KEY), repeat) # schedule from cache.key_schedules
+    _record(results, 'aes.key_setup.warm', seconds, peak)
+    block = bytes(16)
+    seconds, _, _ = _measure(lambda: [aes.encrypt_block(block) for _ in range(1000)], repeat)
+    _record(results, 'aes.block', seconds / 1000, 0, payload_bytes=16)
+    for size in (1024, 1 << 16): # pure python aes runs at a few hundred KB/s, larger sizes only add minutes
+        data = np.random.default_rng(2).integers(0, 256, size, dtype=np.uint8).tobytes()
+        for mode in AESAlgorithm.MODES:
+            if mode == 'CTR':
+                func = lambda: aes.encrypt_ctr_mode(data, AES_IV)
+            else:
+                func = lambda: aes.encrypt_cbc_mode(data, AES_IV)
+            seconds, peak, _ = _measure(func, repeat)
+            _record(results, f'aes.{mode.lower()}', seconds, peak, payload_bytes=size)
+
+def _compression_payloads(): # (label, data) pairs, every codec must give them back unchanged
+    rng = np.random.default_rng(3)
+    log = ''.join(f'{{"level": "INFO", "request": {i}, "ms": {i % 97}}}\n' for i in range(20000)).encode() # json log lines
+    block = rng.integers(0, 256, 7 << 20, dtype=np.uint8).tobytes()
+    far = block + block[:1 << 20] # only compressible through a match 7 MiB back, needs the decoder to keep the encoder's 8 MiB dictionary
+    return (('json_log', log), ('far_match', far))
+
+def bench_compression(results, repeat):
+    for label, data in _compression_payloads():
+        for codec in Compression.CODECS[1:]:
+            runs = 1 if len(data) > 1 << 20 else repeat # lzma spends seconds on the large payload
+            seconds, peak, (used, compressed) = _measure(lambda: Compression.compress(data, codec), runs)
+            _record(results, f'compression.{codec}.compress', seconds, peak, label, payload_bytes=len(data),
+                    used=used, ratio=round(len(data) / len(compressed), 3))
+            if used == 'None':
+                continue # skipped as not smaller, nothing to decode
+            seconds, peak, restored = _measure(lambda: Compression.decompress(compressed, used), runs)
+            if restored != data:
+                raise ValueError(f"{codec} round trip of {label} payload ({len(data)} bytes) does not match")
+            _record(results, f'compression.{codec}.decompress', seconds, peak, label, payload_bytes=len(data))
+
+def bench_round_trip(results, cover, kind, megapixels, repeat):
+    from steganography import Steganography
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cover_path = os.path.join(temp_dir, 'cover.bmp') # uncompressed so file codecs do not dominate
+        stego_path = os.path.join(temp_dir, 'stego.bmp')
+        cover.save(cover_path)
+        for algorithm in ('X Significant Bit', 'Pixel Value Differencing'):
+            for encryption in ('None', 'AES'):
+                config = {'algorithm': algorithm, 'encryption': encryption, 'noise_level': 1.0, 'bit_position': 1,
+                          'key': AES_KEY.decode(), 'iv': AES_IV.decode(), 'noise_seed': 0}
+                steganography = Steganography(config)
+                text = 'x' * min(4096, steganography.capacity(cover))
+                if not text:
+                    continue
+                label = f"round_trip.{'xsb' if algorithm == 'X Significant Bit' else 'pvd'}.{encryption.lower()}"
+                embed = lambda: steganography.embed_text(cover_path, text)
+                seconds, peak, stego = _measure(embed, repeat, _clear_caches) # cold, every run decodes the cover
+                _record(results, label + '.embed', seconds, peak, kind, megapixels, len(text))
+                seconds, peak, stego = _measure(embed, repeat) # warm, cover pixels and key schedule come from the caches
+                _record(results, label + '.embed.warm', seconds, peak, kind, megapixels, len(text))
+                stego.save(stego_path)
+                decode = lambda: steganography.decode_text(stego_path)
+                try:
+                    seconds, peak, _ = _measure(decode, repeat, _clear_caches)
+                    warm_seconds, warm_peak, _ = _measure(decode, repeat)
+                except ValueError as e: # pvd clamping at 0/255 can corrupt payloads on extreme covers, record it instead of aborting
+                    _record(results, label + '.decode', 0, 0, kind, megapixels, len(text), error=str(e))
+                    continue
+                _record(results, label + '.decode', seconds, peak, kind, megapixels, len(text))
+                _record(results, label + '.decode.warm', warm_seconds, warm_peak, kind, megapixels, len(text))
+
+def run_suite(sizes=DEFAULT_SIZES, payload_sizes=DEFAULT_PAYLOADS, kinds=COVER_KINDS, repeat=3, backends=('numpy',)):
+    results = []
+    bench_aes(results, repeat)
+    bench_compression(results, repeat)
+    for megapixels in sizes:
+        for kind in kinds:
+            cover = make_cover(kind, megapixels)
+            bench_algorithms(results, cover, kind, megapixels, payload_sizes, repeat, backends)
+            bench_noise(results, cover, kind, megapixels, repeat)
+            bench_round_trip(results, cover, kind, megapixels, repeat)
+    meta = {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'repeat': repeat}
+    return {'meta': meta, 'results': results}
+
+def _key(entry):
+    return (entry['name'], entry.get('cover'), entry.get('megapixels'), entry.get('payload_bytes'),
+            entry.get('backend'), entry.get('noise_level'))
+
+def compare(old, new, threshold=0.10): # returns (key, old seconds, new seconds, ratio) for entries in both runs
+    old_entries = {_key(entry): entry for entry in old['results']}
+    rows = []
+    for entry in new['results']:
+        previous = old_entries.get(_key(entry))
+        if previous and previous['seconds']:
+            ratio = entry['seconds'] / previous['seconds']
+            rows.append((_key(entry), previous['seconds'], entry['seconds'], ratio, ratio > 1 + threshold))
+    return rows
+
+def print_comparison(rows):
+    regressions = 0
+    for key, old_seconds, new_seconds, ratio, regressed in rows:
+        label = ' '.join(str(part) for part in key if part is not None)
+        flag = 'REGRESSION' if regressed else ''
+        print(f"{label:<60} {old_seconds:>10.6f} {new_seconds:>10.6f} {ratio:>6.2f}x {flag}")
+        regressions += regressed
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark embedding algorithms, encryption and noise.')
+    parser.add_argument('--sizes', type=float, nargs='+', default=list(DEFAULT_SIZES), help='cover sizes in megapixels')
+    parser.add_argument('--payloads', type=int, nargs='+', default=list(DEFAULT_PAYLOADS), help='payload sizes in bytes')
+    parser.add_argument('--kinds', nargs='+', default=list(COVER_KINDS), choices=COVER_KINDS, help='synthetic cover kinds')
+    parser.add_argument('--backends', nargs='+', default=['numpy'], choices=['scalar', 'numpy'], help='algorithm backends')
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions per measurement, the fastest is kept')
+    parser.add_argument('-o', '--output', help='write results as JSON')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='diff two result files instead of running')
+    parser.add_argument('--threshold', type=float, default=0.10, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as old_file, open(args.compare[1]) as new_file:
+            rows = compare(json.load(old_file), json.load(new_file), args.threshold)
+        return 1 if print_comparison(rows) else 0
+    report = run_suite(args.sizes, args.payloads, args.kinds, args.repeat, args.backends)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import os
+import numpy as np
+from PIL import Image
+from data_structures.hashtable import LRUCache
+from instrumentation import stage
+
+# process wide caches for derived state that is expensive to rebuild, shared by every Steganography instance and thread
+# in the process, so a long running gui process reuses prior work (one-shot cli runs and batch workers turn the cover cache off)
+
+COVER_CACHE_BYTES = 256 << 20 # decoded pixel arrays kept in memory
+
+covers = LRUCache(max_items=16, max_cost=COVER_CACHE_BYTES) # (path, mtime, size, mode) -> read-only pixel array
+key_schedules = LRUCache(max_items=64) # (key, rounds) -> expanded aes round keys, see enc/aes.py
+
+def disable_cover_cache(): # for one-shot cli runs and batch workers, which never read a cover twice
+    covers.max_cost = 0
+    covers.clear()
+
+def load_pixels(image_path, mode='RGB'): # decoded image as a read-only array, mode None keeps the file's own mode
+    stat = os.stat(image_path)
+    with Image.open(image_path) as image: # opening only parses the header, pixels are decoded on a miss
+        mode = mode or image.mode
+        caching = covers.max_cost != 0
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, mode) # a rewritten file gets a new key
+        pixels = covers.get(key) if caching else None
+        if pixels is None:
+            with stage('load', stat.st_size, image.size[0] * image.size[1]):
+                image.load()
+            if image.mode != mode:
+                with stage('convert', pixels=image.size[0] * image.size[1]):
+                    image = image.convert(mode)
+            pixels = np.asarray(image) # one copy of the decoded frame, read-only as it wraps pillow's bytes
+            pixels.flags.writeable = False # shared between callers, algorithms copy before modifying
+            if caching:
+                covers.insert(key, pixels, cost=pixels.nbytes)
+    return pixels
@@ -0,0 +1,348 @@
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.bmp') # same filter as the gui file dialogs
+TILED_EXTENSIONS = ('.bmp', '.ppm', '.tif', '.tiff') # uncompressed formats the tiled mode can stream
+
+# headless entry point, deliberately free of PyQt6 imports so it starts fast and runs without a display
+# usage: python cli.py <embed|batch|decode|capacity|convert|metrics|bench> --help
+
+def expand_inputs(patterns, extensions=IMAGE_EXTENSIONS): # turn files, directories and glob patterns into a sorted list of image paths
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(os.path.join(pattern, name) for name in sorted(os.listdir(pattern))
+                         if name.lower().endswith(extensions))
+        elif glob.has_magic(pattern):
+            paths.extend(sorted(p for p in glob.glob(pattern) if os.path.isfile(p)))
+        elif os.path.isfile(pattern):
+            paths.append(pattern)
+        else:
+            raise FileNotFoundError(f"No such file or directory: '{pattern}'")
+    return paths
+
+def _output_path(input_path, output_dir, suffix, extension):
+    base = os.path.splitext(os.path.basename(input_path))[0]
+    directory = output_dir if output_dir else os.path.dirname(input_path)
+    return os.path.join(directory, base + suffix + extension)
+
+def _load_steganography(config_path):
+    from steganography import Steganography # imported lazily so --help stays instant
+    return Steganography(Steganography.load_config(config_path))
+
+def _one_shot(): # commands that read every cover once, the cover cache would only keep a full frame per image alive
+    import cache
+    cache.disable_cover_cache()
+
+def _read_text(args):
+    if args.payload_file:
+        return None # raw bytes are read by the embedder itself
+    if args.text_file:
+        with open(args.text_file, 'r', encoding='utf-8') as file:
+            return file.read()
+    return args.text
+
+def _report_error(path, error):
+    print(f"{path}: error: {error}", file=sys.stderr)
+
+def cmd_embed(args):
+    _one_shot()
+    steganography = _load_steganography(args.config)
+    text = _read_text(args)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    if args.tiled: # the stego file keeps the cover's uncompressed format
+        tile_rows = args.tile_rows or 0
+        inputs = expand_inputs(args.inputs, TILED_EXTENSIONS)
+        extension = lambda path: os.path.splitext(path)[1]
+    else:
+        tile_rows = None
+        inputs = expand_inputs(args.inputs)
+        extension = lambda path: args.format
+    if args.workers or args.manifest: # process pool mode
+        if text is None:
+            raise ValueError("--payload-file is not supported with --workers or --manifest")
+        jobs = [(path, text, _output_path(path, args.output_dir, args.suffix, extension(path))) for path in inputs]
+        return _report_batch(steganography.embed_batch(jobs, args.workers, args.manifest, tile_rows))
+    failures = 0
+    for path in inputs:
+        output_path = _output_path(path, args.output_dir, args.suffix, extension(path))
+        try:
+            if args.tiled and text is None:
+                steganography.embed_file_tiled(path, args.payload_file, output_path, tile_rows=args.tile_rows)
+            elif args.tiled:
+                steganography.embed_text_tiled(path, text, output_path, tile_rows=args.tile_rows)
+            else:
+                image = steganography.embed_file(path, args.payload_file) if text is None else steganography.embed_text(path, text)
+                steganography.save_image(image, output_path)
+            print(f"{path} -> {output_path}")
+        except Exception as e:
+            _report_error(path, e)
+            failures += 1
+    return 1 if failures else 0
+
+def cmd_batch(args):
+    from batch import BatchEmbedder
+    from steganography import Steganography
+    jobs = BatchEmbedder.load_jobs(args.jobs)
+    for _, _, output in jobs:
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+    return _report_batch(BatchEmbedder(Steganography.load_config(args.config), args.workers).run(jobs, args.manifest))
+
+def _report_batch(results):
+    failures = 0
+    for result in results:
+        if result['status'] == 'ok':
+            print(f"{result['cover']} -> {result['output']}")
+        else:
+            _report_error(result['cover'], result['error'])
+            failures += 1
+    return 1 if failures else 0
+
+def _detected_settings(config): # probe result without secrets, for printing
+    return {key: value for key, value in config.items() if key not in ('key', 'iv')}
+
+def cmd_decode(args):
+    if args.auto and args.tiled:
+        raise ValueError("--auto cannot be combined with --tiled")
+    if not args.config and not args.auto:
+        raise ValueError("decode needs --config unless --auto is given")
+    paths = expand_inputs(args.inputs, TILED_EXTENSIONS if args.tiled else IMAGE_EXTENSIONS)
+    if not args.auto: # --auto probes and then extracts from the same cached pixels
+        _one_shot()
+    if args.auto: # probe every known layout, the config (if any) only supplies keys
+        from probe import ConfigProbe
+        from steganography import Steganography
+        base_config = Steganography.load_config(args.config) if args.config else None
+        probe = ConfigProbe(args.workers)
+        extract = lambda path: probe.extract(path, base_config)
+    else:
+        steganography = _load_steganography(args.config)
+        if args.tiled:
+            extract = lambda path: (steganography.extract_bytes_tiled(path, tile_rows=args.tile_rows), None)
+        else:
+            extract = lambda path: (steganography.extract_bytes(path), None)
+    if args.output: # raw bytes to a file, binary safe
+        if len(paths) != 1:
+            raise ValueError("--output needs exactly one input image")
+        data, _ = extract(paths[0])
+        with open(args.output, 'wb') as file:
+            file.write(data)
+        print(f"{paths[0]} -> {args.output} ({len(data)} bytes)")
+        return 0
+    failures = 0
+    for path in paths:
+        try:
+            data, detected = extract(path)
+            text = data.decode()
+        except Exception as e:
+            _report_error(path, e)
+            failures += 1
+            continue
+        if args.json:
+            entry = {'path': path, 'text': text}
+            if detected:
+                entry['config'] = _detected_settings(detected)
+            print(json.dumps(entry))
+        else:
+            print(f"{path}\t{text}")
+            if detected:
+                print(f"{path}: detected {json.dumps(_detected_settings(detected))}", file=sys.stderr)
+    return 1 if failures else 0
+
+def cmd_capacity(args):
+    _one_shot()
+    steganography = _load_steganography(args.config)
+    failures = 0
+    for path in expand_inputs(args.inputs):
+        try:
+            print(f"{path}\t{steganography.capacity(path)}") # text bytes that fit after header and encryption overhead
+        except Exception as e:
+            _report_error(path, e)
+            failures += 1
+    return 1 if failures else 0
+
+def cmd_convert(args):
+    from conversion import ImageConverter
+    os.makedirs(args.output_dir, exist_ok=True)
+    resize = tuple(int(v) for v in args.resize.lower().split('x')) if args.resize else None
+    converter = ImageConverter(args.format, args.quality, resize, args.keep_aspect, args.overwrite, args.workers)
+
+    def report(result): # printed as files complete, so the order follows completion
+        if result['status'] == 'ok':
+            print(f"{result['input']} -> {result['output']}")
+        else:
+            _report_error(result['input'], result['error'])
+
+    results = converter.run(expand_inputs(args.inputs), args.output_dir, on_result=report)
+    return 1 if any(result['status'] != 'ok' for result in results) else 0
+
+def _find_stego(cover_path, stego_dir, suffix): # stego image written by embed for cover_path, in any output format
+    candidates = [_output_path(cover_path, stego_dir, suffix, extension)
+                  for extension in ('.png', '.bmp', os.path.splitext(cover_path)[1])]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return candidates[0] # missing, reported as an error for this cover
+
+def _finite(value): # strict json has no infinity, psnr of identical images is written as null
+    if isinstance(value, float) and math.isinf(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_finite(item) for item in value]
+    return value
+
+def cmd_metrics(args):
+    from metrics import ImageMetrics
+    covers = [path for path in expand_inputs(args.inputs) # stego images saved next to their covers are not covers
+              if not (args.suffix and os.path.splitext(os.path.basename(path))[0].endswith(args.suffix))]
+    if args.config: # embed in memory and measure, for tuning a config without writing stego images
+        steganography = _load_steganography(args.config)
+        text = args.text if args.text is not None else 'x' * args.payload_size
+        pairs = [(path, lambda path=path: steganography.embed_text(path, text)) for path in covers]
+    else: # compare covers with the stego images embed wrote for them
+        _one_shot()
+        pairs = [(path, _find_stego(path, args.stego_dir, args.suffix)) for path in covers]
+
+    def report(result): # printed as images complete, so the order follows completion
+        if result['status'] == 'ok':
+            print(json.dumps(_finite(result)))
+        else:
+            _report_error(result['cover'], result['error'])
+
+    results = ImageMetrics(args.tile_rows, args.workers).run(pairs, on_result=report)
+    if args.summary:
+        print(json.dumps(_finite({'summary': ImageMetrics.summary(results)})))
+    return 1 if any(result['status'] != 'ok' for result in results) else 0
+
+def cmd_bench(args):
+    if not args.inputs: # no images given, run the synthetic benchmark suite
+        import bench
+        suite_args = ['--sizes', *map(str, args.sizes), '--repeat', str(args.repeat)]
+        if args.output:
+            suite_args += ['--output', args.output]
+        if args.compare:
+            suite_args = ['--compare', *args.compare]
+        return bench.main(suite_args)
+    if not args.config:
+        raise ValueError("bench needs --config when images are given")
+    import tempfile
+    steganography = _load_steganography(args.config)
+    text = 'x' * args.payload_size
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, 'bench.png')
+        for path in expand_inputs(args.inputs):
+            embed_times, decode_times = [], []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                image = steganography.embed_text(path, text)
+                embed_times.append(time.perf_counter() - start)
+                steganography.save_image(image, output_path)
+                start = time.perf_counter()
+                steganography.decode_text(output_path)
+                decode_times.append(time.perf_counter() - start)
+            print(json.dumps({'path': path, 'payload_bytes': args.payload_size, 'repeat': args.repeat,
+                              'embed_s': min(embed_times), 'decode_s': min(decode_times)}))
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='stegonosaurus', description='Headless image steganography.')
+    parser.add_argument('--timings', help='append per-stage timings (wall time, bytes, pixels) as JSON lines to this file')
+    parser.add_argument('--profile', help='run cProfile inside every pipeline stage and write the stats to this file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    embed = commands.add_parser('embed', help='embed text into one or more images')
+    embed.add_argument('inputs', nargs='+', help='image files, directories or glob patterns')
+    embed.add_argument('-c', '--config', required=True, help='JSON config, same format as the GUI config generator')
+    text = embed.add_mutually_exclusive_group(required=True)
+    text.add_argument('-t', '--text', help='text to embed')
+    text.add_argument('--text-file', help='read the text to embed from a UTF-8 file')
+    text.add_argument('--payload-file', help='embed the raw bytes of any file')
+    embed.add_argument('-o', '--output-dir', help='directory for stego images (default: next to the input)')
+    embed.add_argument('--suffix', default='_stego', help='suffix added to output file names')
+    embed.add_argument('--format', default='.png', choices=['.png', '.bmp'], help='lossless output format')
+    embed.add_argument('-j', '--workers', type=int, help='embed in a process pool with this many workers')
+    embed.add_argument('--manifest', help='write a JSON lines manifest of per-image status, timing and output hash')
+    embed.add_argument('--tiled', action='store_true', help='stream uncompressed BMP/PPM/TIFF covers a band of rows at a time')
+    embed.add_argument('--tile-rows', type=int, help='rows per band in tiled mode (default: derived from the image width)')
+    embed.set_defaults(func=cmd_embed)
+
+    batch = commands.add_parser('batch', help='embed a JSON lines job list of {"cover", "payload", "output"} in a process pool')
+    batch.add_argument('jobs', help='JSON lines job file')
+    batch.add_argument('-c', '--config', required=True, help='JSON config, same format as the GUI config generator')
+    batch.add_argument('-j', '--workers', type=int, help='number of worker processes (default: all cores)')
+    batch.add_argument('--manifest', help='write a JSON lines manifest of per-job status, timing and output hash')
+    batch.set_defaults(func=cmd_batch)
+
+    decode = commands.add_parser('decode', help='decode text from one or more images')
+    decode.add_argument('inputs', nargs='+', help='image files, directories or glob patterns')
+    decode.add_argument('-c', '--config', help='JSON config used for embedding (with --auto only its key and IV are used)')
+    decode.add_argument('--json', action='store_true', help='print one JSON object per image')
+    decode.add_argument('-o', '--output', help='write the embedded bytes of a single image to this file')
+    decode.add_argument('--auto', action='store_true', help='detect algorithm, bit position and encryption by probing every layout')
+    decode.add_argument('-j', '--workers', type=int, help='threads used to probe candidate layouts with --auto')
+    decode.add_argument('--tiled', action='store_true', help='read uncompressed BMP/PPM/TIFF images a band of rows at a time')
+    decode.add_argument('--tile-rows', type=int, help='rows per band in tiled mode (default: derived from the image width)')
+    decode.set_defaults(func=cmd_decode)
+
+    capacity = commands.add_parser('capacity', help='print how many bytes of text each image can hold')
+    capacity.add_argument('inputs', nargs='+', help='image files, directories or glob patterns')
+    capacity.add_argument('-c', '--config', required=True, help='JSON config selecting the algorithm and encryption')
+    capacity.set_defaults(func=cmd_capacity)
+
+    convert = commands.add_parser('convert', help='convert images between formats')
+    convert.add_argument('inputs', nargs='+', help='image files, directories or glob patterns')
+    convert.add_argument('-o', '--output-dir', required=True, help='directory for converted images')
+    convert.add_argument('--format', default='.png', choices=list(IMAGE_EXTENSIONS), help='output format')
+    convert.add_argument('--quality', type=int, default=90, help='JPEG quality (1-100)')
+    convert.add_argument('--resize', help='resize to WIDTHxHEIGHT')
+    convert.add_argument('--keep-aspect', action='store_true', help='keep the aspect ratio when resizing')
+    convert.add_argument('--overwrite', action='store_true', help='overwrite existing files')
+    convert.add_argument('-j', '--workers', type=int, help='files converted concurrently (default: all cores)')
+    convert.set_defaults(func=cmd_convert)
+
+    metrics = commands.add_parser('metrics', help='measure distortion (MSE, PSNR, SSIM, histogram divergence) of stego images')
+    metrics.add_argument('inputs', nargs='+', help='cover image files, directories or glob patterns')
+    metrics.add_argument('-s', '--stego-dir', help='directory holding the stego images (default: next to the covers)')
+    metrics.add_argument('--suffix', default='_stego', help='suffix embed added to stego file names')
+    metrics.add_argument('-c', '--config', help='embed with this JSON config in memory and measure the result instead of reading stego files')
+    metrics.add_argument('-t', '--text', help='text to embed with --config (default: --payload-size filler bytes)')
+    metrics.add_argument('--payload-size', type=int, default=1024, help='filler payload size in bytes with --config')
+    metrics.add_argument('-j', '--workers', type=int, help='images measured concurrently (default: all cores)')
+    metrics.add_argument('--tile-rows', type=int, help='rows per band (default: derived from the image width)')
+    metrics.add_argument('--summary', action='store_true', help='print mean, min and max of every metric as a final JSON line')
+    metrics.set_defaults(func=cmd_metrics)
+
+    bench = commands.add_parser('bench', help='time round trips on the given images, or run the synthetic suite without images')
+    bench.add_argument('inputs', nargs='*', help='image files, directories or glob patterns')
+    bench.add_argument('-c', '--config', help='JSON config to benchmark (required with images)')
+    bench.add_argument('--payload-size', type=int, default=1024, help='payload size in bytes')
+    bench.add_argument('--repeat', type=int, default=3, help='repetitions per measurement, the fastest is reported')
+    bench.add_argument('--sizes', type=float, nargs='+', default=[0.3, 1, 4, 12, 24, 50], help='suite cover sizes in megapixels')
+    bench.add_argument('-o', '--output', help='write suite results as JSON')
+    bench.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='diff two suite result files')
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    import instrumentation
+    instrumentation.configure_logging()
+    instrumentation.enable(args.timings or os.environ.get('STEGANOGRAPHY_TIMINGS'),
+                           args.profile or os.environ.get('STEGANOGRAPHY_PROFILE'))
+    try:
+        return args.func(args)
+    except (FileNotFoundError, KeyError, ValueError) as e: # configuration or input problems, not per-image failures
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
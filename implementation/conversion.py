@@ -0,0 +1,93 @@
+import os
+import threading
+from PIL import Image
+from data_structures.linkedlist import LinkedList
+from instrumentation import run_job
+
+# image format conversion shared by the gui conversion page and the cli convert command
+# files are converted by a pool of worker threads, pillow releases the gil while decoding, resampling and encoding,
+# so threads scale across cores without pickling images between processes
+
+FORMATS = {'.png': 'PNG', '.jpg': 'JPEG', '.bmp': 'BMP'}
+
+class ImageConverter:
+    def __init__(self, output_format='.png', quality=90, resize=None, keep_aspect=False, overwrite=False, workers=None):
+        if output_format not in FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self._output_format = output_format
+        self._quality = quality
+        self._resize = resize # (width, height) or None
+        self._keep_aspect = keep_aspect
+        self._overwrite = overwrite
+        self._workers = workers or os.cpu_count() or 1
+
+    def plan(self, paths, output_dir): # (input, output) pairs, every output name is decided before any file is written
+        reserved = set() # names taken earlier in this run, concurrent workers must never share an output file
+        jobs = []
+        for path in paths:
+            output_path = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + self._output_format)
+            base, ext = os.path.splitext(output_path)
+            counter = 1
+            while output_path in reserved or (not self._overwrite and os.path.exists(output_path)):
+                output_path = f"{base}_{counter}{ext}" # add counter to filename if file already exists
+                counter += 1
+            reserved.add(output_path)
+            jobs.append((path, output_path))
+        return jobs
+
+    def convert(self, input_path, output_path): # one file, raises on failure
+        with Image.open(input_path) as img:
+            if self._resize:
+                if self._keep_aspect:
+                    img.thumbnail(self._resize) # resize while maintaining aspect ratio, lets jpeg decode at reduced scale
+                else:
+                    img = img.resize(self._resize)
+            if self._output_format == '.jpg':
+                if img.mode not in ('RGB', 'L', 'CMYK'): # jpeg has no alpha or palette
+                    img = img.convert('RGB')
+                img.save(output_path, format='JPEG', quality=self._quality)
+            else:
+                img.save(output_path, format=FORMATS[self._output_format])
+
+    def _run_job(self, job):
+        input_path, output_path = job
+        return run_job({'input': input_path, 'output': output_path}, lambda: self.convert(input_path, output_path))
+
+    def _work(self, tasks, results): # worker thread, takes files until the task list is empty or drained
+        while True:
+            task = tasks.pop()
+            if task is None:
+                return
+            index, job = task
+            results.put((index, self._run_job(job)))
+
+    def run(self, paths, output_dir, progress=None, on_result=None):
+        # converts every path into output_dir, returns one result dict per input in input order
+        # progress(fraction, stage) is called as files complete and may raise to stop, queued files are then dropped
+        # on_result(result) sees each result as soon as its file is done
+        jobs = self.plan(paths, output_dir)
+        results = [None] * len(jobs)
+        if not jobs:
+            return results
+        tasks = LinkedList('fifo') # shared by the workers, files are started in input order
+        tasks.extend(enumerate(jobs))
+        finished = LinkedList('fifo') # (index, result) pairs, get blocks until a worker delivers one
+        workers = [threading.Thread(target=self._work, args=(tasks, finished), daemon=True)
+                   for _ in range(min(self._workers, len(jobs)))]
+        for worker in workers:
+            worker.start()
+        failed = 0
+        try:
+            for done in range(1, len(jobs) + 1):
+                index, result = finished.get()
+                results[index] = result
+                failed += result['status'] != 'ok'
+                if on_result is not None:
+                    on_result(result)
+                if progress is not None:
+                    progress(done / len(jobs), f"Converted {done}/{len(jobs)} images, {failed} failed")
+        finally:
+            tasks.drain() # on cancel, running files finish and queued ones are dropped
+            for worker in workers:
+                worker.join()
+        return results
@@ -1,49 +1,67 @@
+import threading
+
 class HashNode: # node class for chaining
+    __slots__ = ('key', 'value', 'next', 'cost', 'older', 'newer') # cost, older and newer are only used by LRUCache
+
     def __init__(self, key, value):
         self.key = key
         self.value = value
         self.next = None
+        self.cost = 0
+        self.older = None
+        self.newer = None
+
+class HashTable: # chained hash table that doubles its bucket count past MAX_LOAD
+    MAX_LOAD = 0.75 # entries per bucket before resizing
 
-class HashTable: # initial implementation of a hash table
     def __init__(self, size=256):
         self.size = size
         self.table = [None] * size
         self.count = 0
-    
-    def _hash(self, key): # custom hash function to handle strings
-        if isinstance(key, str):
-            hash_value = 0
-            for char in key:
-                hash_value = (hash_value * 31 + ord(char)) % self.size
-            return hash_value
-        return key % self.size
-    
-    def insert(self, key, value): # insert a key-value pair
+
+    def _hash(self, key): # builtin hash, computed in C and cached on str and bytes objects
+        return hash(key) % self.size
+
+    def _find(self, key): # node for key or None
+        current = self.table[self._hash(key)]
+        while current:
+            if current.key == key:
+                return current
+            current = current.next
+        return None
+
+    def _resize(self, size): # rehash every node into a new bucket array, nodes are relinked rather than copied
+        old_table = self.table
+        self.size = size
+        self.table = [None] * size
+        for current in old_table:
+            while current:
+                following = current.next
+                index = self._hash(current.key)
+                current.next = self.table[index]
+                self.table[index] = current
+                current = following
+
+    def insert(self, key, value): # insert a key-value pair, returns the node holding it
         index = self._hash(key)
-        if not self.table[index]:
-            self.table[index] = HashNode(key, value)
-            self.count += 1
-            return        
         current = self.table[index] # handle collision with chaining
         while current:
             if current.key == key:
                 current.value = value # update existing key
-                return
-            if not current.next:
-                break
+                return current
             current = current.next
-        current.next = HashNode(key, value)
+        node = HashNode(key, value)
+        node.next = self.table[index]
+        self.table[index] = node
         self.count += 1
-    
+        if self.count > self.size * HashTable.MAX_LOAD:
+            self._resize(self.size * 2)
+        return node
+
     def get(self, key, default=None): # get value for a key
-        index = self._hash(key)
-        current = self.table[index]
-        while current:
-            if current.key == key:
-                return current.value
-            current = current.next
-        return default
-    
+        node = self._find(key)
+        return default if node is None else node.value
+
     def remove(self, key): # remove a key-value pair
         index = self._hash(key)
         current = self.table[index]
@@ -59,13 +77,94 @@ class HashTable: # initial implementation of a hash table
             prev = current
             current = current.next
         return False
-    
+
     def __len__(self):
         return self.count
-    
+
     def __contains__(self, key): # check if key exists
-        return self.get(key) is not None
-    
+        return self._find(key) is not None
+
     def clear(self): # wipe the hash table
         self.table = [None] * self.size
-        self.count = 0
\ No newline at end of file
+        self.count = 0
+
+class LRUCache(HashTable): # thread safe hash table that evicts the least recently used entries past max_items or max_cost
+    def __init__(self, max_items=128, max_cost=None, size=64):
+        super().__init__(size)
+        self.max_items = max_items
+        self.max_cost = max_cost # None for no cost bound, costs are whatever unit insert is given (bytes for images)
+        self.total_cost = 0
+        self.hits = 0
+        self.misses = 0
+        self._oldest = None # recency list, oldest to newest
+        self._newest = None
+        self._lock = threading.RLock()
+
+    def _unlink(self, node):
+        if node.older:
+            node.older.newer = node.newer
+        else:
+            self._oldest = node.newer
+        if node.newer:
+            node.newer.older = node.older
+        else:
+            self._newest = node.older
+        node.older = node.newer = None
+
+    def _link_newest(self, node):
+        node.older = self._newest
+        if self._newest:
+            self._newest.newer = node
+        else:
+            self._oldest = node
+        self._newest = node
+
+    def insert(self, key, value, cost=1):
+        with self._lock:
+            if self.max_cost is not None and cost > self.max_cost:
+                self.remove(key) # too large to ever fit, any older entry for the key is stale
+                return
+            node = self._find(key)
+            if node is not None:
+                self.total_cost -= node.cost
+                self._unlink(node)
+            node = super().insert(key, value)
+            node.cost = cost
+            self.total_cost += cost
+            self._link_newest(node)
+            while self.count > self.max_items or (self.max_cost is not None and self.total_cost > self.max_cost):
+                self.remove(self._oldest.key) # evict least recently used
+
+    def get(self, key, default=None): # counts a hit or miss and marks the entry as most recently used
+        with self._lock:
+            node = self._find(key)
+            if node is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._unlink(node)
+            self._link_newest(node)
+            return node.value
+
+    def remove(self, key):
+        with self._lock:
+            node = self._find(key)
+            if node is None:
+                return False
+            self._unlink(node)
+            self.total_cost -= node.cost
+            return super().remove(key)
+
+    def __contains__(self, key): # does not count as a hit or miss
+        with self._lock:
+            return super().__contains__(key)
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._oldest = self._newest = None
+            self.total_cost = 0
+
+    def stats(self):
+        with self._lock:
+            return {'items': self.count, 'cost': self.total_cost, 'hits': self.hits, 'misses': self.misses}
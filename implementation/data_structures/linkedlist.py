@@ -1,56 +1,129 @@
+import threading
+import time
+from queue import Empty, Full
+
 class ListNode:
+    __slots__ = ('_data', '_next', '_prev') # no per-node __dict__, queues can hold a lot of pending tasks
+
     def __init__(self, data=None):
         self._data = data
         self._next = None
+        self._prev = None
 
     @property
     def data(self):
         return self._data
-    
+
     @property
     def next(self):
         return self._next
-    
+
     @next.setter
     def next(self, value):
         self._next = value # set next node
 
 class LinkedList:
-    def __init__(self):
+    # doubly linked work queue with head and tail pointers and a maintained size, every operation is O(1)
+    # 'lifo' (the original behaviour) takes items from the tail, 'fifo' from the head, items are always added at the tail
+    # all methods are thread safe, with maxsize > 0 put blocks while the list is full
+    MODES = ('lifo', 'fifo')
+
+    def __init__(self, mode='lifo', maxsize=0):
+        if mode not in LinkedList.MODES:
+            raise ValueError(f"Unsupported mode: {mode}")
         self._head = None  # private head of linked list
+        self._tail = None
+        self._size = 0
+        self._mode = mode
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
 
-    def append(self, data):
+    def _link(self, data): # caller holds the lock
         new_node = ListNode(data)
-        if not self._head: # if linked list is empty
+        if not self._tail: # if linked list is empty
             self._head = new_node # set new node as head
+        else:
+            new_node._prev = self._tail
+            self._tail.next = new_node
+        self._tail = new_node
+        self._size += 1
+        self._not_empty.notify()
+
+    def _unlink(self): # caller holds the lock and has checked the list is not empty
+        if self._mode == 'fifo':
+            node = self._head
+            self._head = node.next
+            if self._head:
+                self._head._prev = None
+            else:
+                self._tail = None
+        else:
+            node = self._tail
+            self._tail = node._prev
+            if self._tail:
+                self._tail.next = None
+            else:
+                self._head = None
+        self._size -= 1
+        self._not_full.notify()
+        return node.data
+
+    def _wait(self, condition, ready, block, timeout, error): # caller holds the lock
+        if not block:
+            if not ready():
+                raise error
             return
-        last = self._head # traverse to the last node
-        while last.next:
-            last = last.next
-        last.next = new_node
-
-    def pop(self):
-        if not self._head: # if linked list is empty
-            return None
-        if not self._head.next: # if linked list has only one node
-            data = self._head.data
-            self._head = None 
-            return data
-        prev = None
-        last = self._head # traverse to the last node
-        while last.next: # find the second last node
-            prev = last
-            last = last.next
-        prev.next = None
-        return last.data # return the data of the last node
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not ready():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise error
+            condition.wait(remaining)
+
+    def put(self, data, block=True, timeout=None): # raises queue.Full when bounded and no space frees up in time
+        with self._not_full:
+            if self._maxsize > 0:
+                self._wait(self._not_full, lambda: self._size < self._maxsize, block, timeout, Full)
+            self._link(data)
+
+    def get(self, block=True, timeout=None): # raises queue.Empty when nothing arrives in time
+        with self._not_empty:
+            self._wait(self._not_empty, lambda: self._size > 0, block, timeout, Empty)
+            return self._unlink()
+
+    def append(self, data): # never blocks, ignores maxsize like the original list
+        with self._lock:
+            self._link(data)
+
+    def extend(self, items): # adds items in order, blocking for space when bounded
+        if self._maxsize > 0:
+            for item in items:
+                self.put(item)
+            return
+        with self._lock:
+            for item in items:
+                self._link(item)
+
+    def pop(self): # non-blocking get, None when empty
+        with self._lock:
+            if not self._size: # if linked list is empty
+                return None
+            return self._unlink()
+
+    def drain(self, max_items=None): # removes and returns up to max_items items in get order without blocking
+        with self._lock:
+            count = self._size if max_items is None else min(max_items, self._size)
+            items = [self._unlink() for _ in range(count)]
+            self._not_full.notify_all()
+            return items
 
     def is_empty(self):
-        return self._head is None
+        return self._size == 0
 
     def length(self):
-        length = 0
-        current = self._head # traverse to the last node
-        while current:
-            length += 1
-            current = current.next # move to the next node
-        return length
\ No newline at end of file
+        return self._size
+
+    def __len__(self):
+        return self._size
@@ -1,3 +1,6 @@
+import struct
+from cache import key_schedules
+
 class AESUtils:
     @staticmethod
     def _multiply_time(byte_val):
@@ -7,28 +10,32 @@ class AESUtils:
     def _convert_bytes_to_matrix(data_bytes):
         return [list(data_bytes[i:i+4]) for i in range(0, len(data_bytes), 4)] # returns list of lists, 4 bytes each
 
-    @staticmethod
-    def _convert_matrix_to_bytes(matrix_data):
-        return bytes(sum(matrix_data, [])) # returns bytes object of matrix data
-
     @staticmethod
     def _xor_two_bytes(a_bytes, b_bytes):
         return bytes(a ^ b for a, b in zip(a_bytes, b_bytes)) # returns bytes object of xor of two bytes objects
 
+    @staticmethod
+    def _xor_long(a_bytes, b_bytes): # xor of two equal length byte strings in one big integer operation
+        length = len(a_bytes)
+        return (int.from_bytes(a_bytes, 'big') ^ int.from_bytes(b_bytes[:length], 'big')).to_bytes(length, 'big')
+
     @staticmethod
     def _apply_padding(text):
         pad_length = 16 - (len(text) % 16) # calculates padding length
         padding = bytes([pad_length] * pad_length) # creates bytes object of padding length
-        return text + padding
+        return bytes(text) + padding # bytes() so bytearray and memoryview input work too
 
     @staticmethod
     def _remove_padding(text):
+        if not text:
+            raise ValueError("Ciphertext is empty or truncated") # there is always at least one padding byte
         pad_len = text[-1] # gets last byte of text
         return text[:-pad_len] # returns text without padding
 
     @staticmethod
-    def _divide_into_blocks(message, size=16):
-        return [message[i:i+size] for i in range(0, len(message), size)] # returns list of blocks of size 16
+    def _check_ciphertext(ciphertext): # cbc output is whole blocks, at least one since padding is always added
+        if not ciphertext or len(ciphertext) % 16:
+            raise ValueError("Ciphertext is empty or truncated")
 
     @staticmethod
     def _multiply_poly(a, b):
@@ -53,14 +60,6 @@ class AESUtils:
         modulus = 0x11b # x^8 + x^4 + x^3 + x + 1 // 100011011
         return AESUtils._modulo_polynomial(product, modulus)
 
-    @staticmethod
-    def _galois_inverse(a): # calculates inverse of a in galois field (used for affine transformation)
-        if a == 0:
-            return 0
-        for i in range(1, 256):
-            if AESUtils._galois_mult(a, i) == 1:
-                return i
-
     @staticmethod
     def _bitwise_dot(a, b):
         product = a & b # bitwise and of a and b
@@ -80,16 +79,24 @@ class AESUtils:
         return result ^ const # xor result with const
 
     @staticmethod
-    def _compute_sbox(val):
-        inv = AESUtils._galois_inverse(val)
+    def _generate_sbox(): # actual sbox generation
+        exp_table, log_table = AESUtils._create_log_tables()
         trans_matrix = int('F87C3E1F8FC7E3F1', 16) # standard rijndael affine transformation matrix, hex
         const = int('63', 16) # standard rijndael affine transformation constant, hex
-        return AESUtils._affine_trans(trans_matrix, inv, const)
+        sbox = [AESUtils._affine_trans(trans_matrix, exp_table[255 - log_table[i]] if i else 0, const) for i in range(256)] # inverse via log tables instead of a brute force search
+        return tuple(sbox)
 
     @staticmethod
-    def _generate_sbox(): # actual sbox generation
-        sbox = [AESUtils._compute_sbox(i) for i in range(256)]
-        return tuple(sbox)
+    def _create_log_tables(): # powers of the generator 3 and their logarithms in GF(2^8)
+        exp_table = [0] * 256
+        log_table = [0] * 256
+        value = 1
+        for i in range(255):
+            exp_table[i] = value
+            log_table[value] = i
+            value ^= AESUtils._multiply_time(value) # multiply by 3 = x * 2 ^ x
+        exp_table[255] = exp_table[0]
+        return exp_table, log_table
 
     @staticmethod
     def _create_round_constants():
@@ -98,36 +105,6 @@ class AESUtils:
             constants.append(AESUtils._multiply_time(constants[-1])) # appends multiplication of last element of constants with 0x02
         return tuple(constants)
 
-    @staticmethod
-    def _shift_row(matrix):
-        for i in range(1, 4):
-            matrix[i] = matrix[i][i:] + matrix[i][:i] # shifts ith row of matrix by i
-
-    @staticmethod
-    def _inverse_shift_row(matrix):
-        for i in range(1, 4):
-            matrix[i] = matrix[i][-i:] + matrix[i][:-i] # shifts ith row of matrix by -i
-
-    @staticmethod
-    def _mix_columns(state):
-        for i in range(4): # for each column
-            column = state[i]
-            temp = column[0] ^ column[1] ^ column[2] ^ column[3] # xor of all elements of column
-            original = column[0]
-            column[0] ^= temp ^ AESUtils._multiply_time(column[0] ^ column[1]) # xor of temp and multiplication of first and second element of column
-            column[1] ^= temp ^ AESUtils._multiply_time(column[1] ^ column[2])
-            column[2] ^= temp ^ AESUtils._multiply_time(column[2] ^ column[3])
-            column[3] ^= temp ^ AESUtils._multiply_time(column[3] ^ original)
-
-    @staticmethod
-    def _inverse_mix_columns(state):
-        for i in range(4):
-            u = AESUtils._multiply_time(AESUtils._multiply_time(state[i][0] ^ state[i][2])) # multiplication of first and third element of column
-            v = AESUtils._multiply_time(AESUtils._multiply_time(state[i][1] ^ state[i][3])) 
-            for j in range(4):
-                state[i][j] ^= u if j % 2 == 0 else v # xor of u if j is even, else xor of v
-        AESUtils._mix_columns(state)
-
     @staticmethod
     def _increment_bytes(a): # increments bytes by 1 - key expansion
         out = list(a) # converts a to list
@@ -138,28 +115,53 @@ class AESUtils:
             out[i] = 0
         return bytes(out)
 
+class AESTables: # sbox, inverse sbox and combined round tables, built once per process on first use
+    _tables = None
+
     @staticmethod
-    def _substitute_bytes(state, sbox):
-        for i in range(4):
-            state[i] = [sbox[b] for b in state[i]] # substitutes each byte in state with sbox value
+    def get():
+        if AESTables._tables is None:
+            AESTables._tables = AESTables._build()
+        return AESTables._tables
 
     @staticmethod
-    def _inverse_substitute_bytes(state, inv_sbox):
-        for i in range(4):
-            state[i] = [inv_sbox[b] for b in state[i]] # sub in state with inv sbox
+    def _rotate_right(word, bits):
+        return ((word >> bits) | (word << (32 - bits))) & 0xFFFFFFFF
 
     @staticmethod
-    def _add_round_key_func(state, key):
-        for i in range(4):
-            state[i] = [state[i][j] ^ key[i][j] for j in range(4)] # xor of state and key
+    def _build():
+        sbox = AESUtils._generate_sbox()
+        inv_sbox = [0] * 256
+        for i, value in enumerate(sbox):
+            inv_sbox[value] = i
+        mult = AESUtils._galois_mult
+        te0, td0 = [], []
+        for x in range(256):
+            s = sbox[x]
+            te0.append((mult(s, 2) << 24) | (s << 16) | (s << 8) | mult(s, 3)) # sub bytes + mix columns for one input byte
+            i = inv_sbox[x]
+            td0.append((mult(i, 14) << 24) | (mult(i, 9) << 16) | (mult(i, 13) << 8) | mult(i, 11)) # inverse sub bytes + inverse mix columns
+        encrypt = tuple(tuple(AESTables._rotate_right(w, 8 * k) for w in te0) for k in range(4))
+        decrypt = tuple(tuple(AESTables._rotate_right(w, 8 * k) for w in td0) for k in range(4))
+        return {'sbox': sbox, 'inv_sbox': tuple(inv_sbox), 'encrypt': encrypt, 'decrypt': decrypt,
+                'constants': AESUtils._create_round_constants()}
 
 class AESAlgorithm:
+    MODES = ('CBC', 'CTR')
+
     def __init__(self, key):
         self._num_rounds = 16
-        self._sbox = AESUtils._generate_sbox()
-        self._inv_sbox = tuple(self._sbox.index(i) for i in range(256))
-        self._constants = AESUtils._create_round_constants()
-        self._key_matrices = self._expand_key(key)
+        tables = AESTables.get()
+        self._sbox = tables['sbox']
+        self._inv_sbox = tables['inv_sbox']
+        self._constants = tables['constants']
+        schedule_key = (bytes(key), self._num_rounds)
+        schedule = key_schedules.get(schedule_key) # expanding the key is the costly part of construction
+        if schedule is None:
+            key_matrices = self._expand_key(key)
+            schedule = (key_matrices, *self._word_keys(key_matrices))
+            key_schedules.insert(schedule_key, schedule)
+        self._key_matrices, self._encrypt_keys, self._decrypt_keys = schedule # shared and never modified
 
     def _expand_key(self, key):
         key_cols = AESUtils._convert_bytes_to_matrix(key)
@@ -179,29 +181,59 @@ class AESAlgorithm:
 
         return [key_cols[j:j + 4] for j in range(0, len(key_cols), 4)] # returns key_cols divided into blocks of 4
 
+    def _word_keys(self, key_matrices): # round keys as 32 bit column words, decryption keys pre-multiplied by inverse mix columns
+        encrypt_keys = [tuple(int.from_bytes(bytes(col), 'big') for col in matrix) for matrix in key_matrices]
+        td0, td1, td2, td3 = AESTables.get()['decrypt']
+        sbox = self._sbox
+        decrypt_keys = [encrypt_keys[0]]
+        for words in encrypt_keys[1:-1]:
+            decrypt_keys.append(tuple(td0[sbox[w >> 24]] ^ td1[sbox[(w >> 16) & 255]] ^ td2[sbox[(w >> 8) & 255]] ^ td3[sbox[w & 255]]
+                                      for w in words))
+        decrypt_keys.append(encrypt_keys[-1])
+        return encrypt_keys, decrypt_keys
+
+    # each state column is a 32 bit word; shift row rotates the bytes within a column by its index,
+    # so column i reads its table inputs starting at byte i (encrypt) or byte -i (decrypt)
+    def _encrypt_words(self, w0, w1, w2, w3):
+        te0, te1, te2, te3 = AESTables.get()['encrypt']
+        keys = self._encrypt_keys
+        k0, k1, k2, k3 = keys[0]
+        w0 ^= k0; w1 ^= k1; w2 ^= k2; w3 ^= k3
+        for rnd in range(1, self._num_rounds):
+            k0, k1, k2, k3 = keys[rnd]
+            w0, w1, w2, w3 = (te0[w0 >> 24] ^ te1[(w0 >> 16) & 255] ^ te2[(w0 >> 8) & 255] ^ te3[w0 & 255] ^ k0,
+                              te0[(w1 >> 16) & 255] ^ te1[(w1 >> 8) & 255] ^ te2[w1 & 255] ^ te3[w1 >> 24] ^ k1,
+                              te0[(w2 >> 8) & 255] ^ te1[w2 & 255] ^ te2[w2 >> 24] ^ te3[(w2 >> 16) & 255] ^ k2,
+                              te0[w3 & 255] ^ te1[w3 >> 24] ^ te2[(w3 >> 16) & 255] ^ te3[(w3 >> 8) & 255] ^ k3)
+        s = self._sbox # last round has no mix columns
+        k0, k1, k2, k3 = keys[-1]
+        return ((s[w0 >> 24] << 24 | s[(w0 >> 16) & 255] << 16 | s[(w0 >> 8) & 255] << 8 | s[w0 & 255]) ^ k0,
+                (s[(w1 >> 16) & 255] << 24 | s[(w1 >> 8) & 255] << 16 | s[w1 & 255] << 8 | s[w1 >> 24]) ^ k1,
+                (s[(w2 >> 8) & 255] << 24 | s[w2 & 255] << 16 | s[w2 >> 24] << 8 | s[(w2 >> 16) & 255]) ^ k2,
+                (s[w3 & 255] << 24 | s[w3 >> 24] << 16 | s[(w3 >> 16) & 255] << 8 | s[(w3 >> 8) & 255]) ^ k3)
+
+    def _decrypt_words(self, w0, w1, w2, w3):
+        td0, td1, td2, td3 = AESTables.get()['decrypt']
+        keys = self._decrypt_keys
+        k0, k1, k2, k3 = keys[-1]
+        w0 ^= k0; w1 ^= k1; w2 ^= k2; w3 ^= k3
+        for rnd in range(self._num_rounds - 1, 0, -1): # starts from last round and goes to first
+            k0, k1, k2, k3 = keys[rnd]
+            w0, w1, w2, w3 = (td0[w0 >> 24] ^ td1[(w0 >> 16) & 255] ^ td2[(w0 >> 8) & 255] ^ td3[w0 & 255] ^ k0,
+                              td0[w1 & 255] ^ td1[w1 >> 24] ^ td2[(w1 >> 16) & 255] ^ td3[(w1 >> 8) & 255] ^ k1,
+                              td0[(w2 >> 8) & 255] ^ td1[w2 & 255] ^ td2[w2 >> 24] ^ td3[(w2 >> 16) & 255] ^ k2,
+                              td0[(w3 >> 16) & 255] ^ td1[(w3 >> 8) & 255] ^ td2[w3 & 255] ^ td3[w3 >> 24] ^ k3)
+        s = self._inv_sbox
+        k0, k1, k2, k3 = keys[0]
+        return ((s[w0 >> 24] << 24 | s[(w0 >> 16) & 255] << 16 | s[(w0 >> 8) & 255] << 8 | s[w0 & 255]) ^ k0,
+                (s[w1 & 255] << 24 | s[w1 >> 24] << 16 | s[(w1 >> 16) & 255] << 8 | s[(w1 >> 8) & 255]) ^ k1,
+                (s[(w2 >> 8) & 255] << 24 | s[w2 & 255] << 16 | s[w2 >> 24] << 8 | s[(w2 >> 16) & 255]) ^ k2,
+                (s[(w3 >> 16) & 255] << 24 | s[(w3 >> 8) & 255] << 16 | s[w3 & 255] << 8 | s[w3 >> 24]) ^ k3)
+
     def _process_block(self, block, encrypt=True):
-        state = AESUtils._convert_bytes_to_matrix(block)
-        if encrypt: # if encrypting, does all steps of aes
-            AESUtils._add_round_key_func(state, self._key_matrices[0])
-            for rnd in range(1, self._num_rounds):
-                AESUtils._substitute_bytes(state, self._sbox)
-                AESUtils._shift_row(state)
-                AESUtils._mix_columns(state)
-                AESUtils._add_round_key_func(state, self._key_matrices[rnd])
-            AESUtils._substitute_bytes(state, self._sbox)
-            AESUtils._shift_row(state)
-            AESUtils._add_round_key_func(state, self._key_matrices[-1])
-        else: # if decrypting, does all steps of aes in reverse
-            AESUtils._add_round_key_func(state, self._key_matrices[-1])
-            AESUtils._inverse_shift_row(state)
-            AESUtils._inverse_substitute_bytes(state, self._inv_sbox)
-            for rnd in range(self._num_rounds - 1, 0, -1): # starts from last round and goes to first
-                AESUtils._add_round_key_func(state, self._key_matrices[rnd])
-                AESUtils._inverse_mix_columns(state)
-                AESUtils._inverse_shift_row(state)
-                AESUtils._inverse_substitute_bytes(state, self._inv_sbox)
-            AESUtils._add_round_key_func(state, self._key_matrices[0])
-        return AESUtils._convert_matrix_to_bytes(state)
+        words = struct.unpack('>4I', block)
+        words = self._encrypt_words(*words) if encrypt else self._decrypt_words(*words)
+        return struct.pack('>4I', *words)
 
     def encrypt_block(self, plaintext): # encrypts block, requires block of 16 bytes
         assert len(plaintext) == 16
@@ -211,20 +243,96 @@ class AESAlgorithm:
         assert len(ciphertext) == 16
         return self._process_block(ciphertext, False)
 
+    def _cbc_encrypt_blocks(self, data, iv): # data must be a multiple of 16 bytes
+        i0, i1, i2, i3 = struct.unpack('>4I', iv)
+        out = bytearray(len(data))
+        for offset in range(0, len(data), 16): # each block is xored with the iv and encrypted
+            w0, w1, w2, w3 = struct.unpack_from('>4I', data, offset)
+            struct.pack_into('>4I', out, offset, *self._encrypt_words(w0 ^ i0, w1 ^ i1, w2 ^ i2, w3 ^ i3))
+        return bytes(out)
+
+    def _cbc_decrypt_blocks(self, data, iv): # trailing partial blocks are ignored
+        i0, i1, i2, i3 = struct.unpack('>4I', iv)
+        out = bytearray(len(data) - len(data) % 16)
+        for offset in range(0, len(out), 16): # decrypts each block of ciphertext
+            w0, w1, w2, w3 = self._decrypt_words(*struct.unpack_from('>4I', data, offset))
+            struct.pack_into('>4I', out, offset, w0 ^ i0, w1 ^ i1, w2 ^ i2, w3 ^ i3)
+        return bytes(out)
+
     def encrypt_cbc_mode(self, plaintext, iv):
         assert len(iv) == 16
         padded = AESUtils._apply_padding(plaintext) # pads plaintext in order to make it multiple of 16
-        previous = iv
-        blocks = [self.encrypt_block(AESUtils._xor_two_bytes(block, previous)) for block in AESUtils._divide_into_blocks(padded)] # encrypts each block of plaintext
-        encrypted_data = b''.join(blocks) # returns joined blocks
-        return encrypted_data
+        return self._cbc_encrypt_blocks(padded, iv)
 
     def decrypt_cbc_mode(self, ciphertext, iv):
         assert len(iv) == 16
-        previous = iv
-        blocks = [AESUtils._xor_two_bytes(previous, self.decrypt_block(block)) for block in AESUtils._divide_into_blocks(ciphertext)] # decrypts each block of ciphertext
-        decrypted_data = AESUtils._remove_padding(b''.join(blocks)) # removes padding and returns joined blocks
-        return decrypted_data
+        AESUtils._check_ciphertext(ciphertext)
+        return AESUtils._remove_padding(self._cbc_decrypt_blocks(ciphertext, iv)) # removes padding
+
+    def keystream(self, iv, start_block, count): # ctr keystream for counter blocks iv + start_block onwards
+        # every block only depends on its counter value, so ranges of the stream can be generated independently
+        counter = int.from_bytes(iv, 'big') + start_block
+        out = bytearray(count * 16)
+        for n in range(count):
+            value = (counter + n) & ((1 << 128) - 1) # counter wraps around like a 128 bit register
+            words = (value >> 96, (value >> 64) & 0xFFFFFFFF, (value >> 32) & 0xFFFFFFFF, value & 0xFFFFFFFF)
+            struct.pack_into('>4I', out, n * 16, *self._encrypt_words(*words))
+        return bytes(out)
+
+    def encrypt_ctr_mode(self, plaintext, iv): # no padding, ciphertext has the same length as the plaintext
+        assert len(iv) == 16
+        stream = self.keystream(iv, 0, -(-len(plaintext) // 16))
+        return AESUtils._xor_long(plaintext, stream)
+
+    def decrypt_ctr_mode(self, ciphertext, iv):
+        return self.encrypt_ctr_mode(ciphertext, iv) # ctr is symmetric
+
+    def encrypt_stream(self, chunks, iv, mode='CTR'): # consumes an iterable of byte chunks and yields ciphertext chunks
+        assert len(iv) == 16
+        if mode == 'CTR':
+            yield from self._ctr_stream(chunks, iv)
+        elif mode == 'CBC':
+            buffer = b''
+            for chunk in chunks:
+                buffer += chunk
+                whole = len(buffer) - len(buffer) % 16 # encrypt complete blocks as soon as they are available
+                if whole:
+                    yield self._cbc_encrypt_blocks(buffer[:whole], iv)
+                    buffer = buffer[whole:]
+            yield self._cbc_encrypt_blocks(AESUtils._apply_padding(buffer), iv) # padding goes on the final block
+        else:
+            raise ValueError(f"Unsupported AES mode: {mode}")
+
+    def decrypt_stream(self, chunks, iv, mode='CTR'): # consumes an iterable of ciphertext chunks and yields plaintext chunks
+        assert len(iv) == 16
+        if mode == 'CTR':
+            yield from self._ctr_stream(chunks, iv)
+        elif mode == 'CBC':
+            buffer = b''
+            for chunk in chunks:
+                buffer += chunk
+                ready = max(0, (len(buffer) - 1) // 16 * 16) # always hold back the last block, it carries the padding
+                if ready:
+                    yield self._cbc_decrypt_blocks(buffer[:ready], iv)
+                    buffer = buffer[ready:]
+            AESUtils._check_ciphertext(buffer) # the held back tail, empty or partial when the input was
+            yield AESUtils._remove_padding(self._cbc_decrypt_blocks(buffer, iv))
+        else:
+            raise ValueError(f"Unsupported AES mode: {mode}")
+
+    def _ctr_stream(self, chunks, iv):
+        block = 0 # next counter block to generate
+        leftover = b'' # unused keystream from the previous chunk
+        for chunk in chunks:
+            if not chunk:
+                continue
+            stream = leftover
+            if len(stream) < len(chunk):
+                count = -(-(len(chunk) - len(stream)) // 16)
+                stream += self.keystream(iv, block, count)
+                block += count
+            yield AESUtils._xor_long(chunk, stream)
+            leftover = stream[len(chunk):]
 
 
 def aes_test():
@@ -0,0 +1,64 @@
+import zlib
+
+# optional payload compression, applied before encryption (encrypted data does not compress)
+# the codec actually used is recorded in the high nibble of the payload header flags, so extraction never needs the config
+# lzma and bz2 are imported on first use, zlib is already loaded for the header checksum
+# raw lzma streams carry no dictionary size: the encoder uses the default preset (8 MiB dictionary), the decoder a 64 MiB one,
+# large enough for every preset, so payloads written at the former preset 9 still decode
+# payloads come from untrusted images, decompression stops one byte past a size limit so a tiny stream cannot expand to gigabytes
+
+class Compression:
+    CODECS = ('None', 'zlib', 'lzma', 'bz2')
+    LIMIT = 64 << 20 # default cap on decompressed payload bytes, configs can raise it with decompression_limit
+
+    @staticmethod
+    def check_codec(codec):
+        if codec not in Compression.CODECS:
+            raise ValueError(f"Unsupported compression: {codec}")
+        return codec
+
+    @staticmethod
+    def _lzma_filters(decoder=False): # a decoder dictionary smaller than the encoder's cannot resolve distant matches
+        import lzma
+        if decoder:
+            return [{'id': lzma.FILTER_LZMA2, 'dict_size': 64 << 20}] # preset 9's dictionary, allocated only as far as the stream needs
+        return [{'id': lzma.FILTER_LZMA2, 'preset': lzma.PRESET_DEFAULT}] # preset 9 costs ~10x the setup time on small payloads
+
+    @staticmethod
+    def compress(data, codec): # returns (codec used, data), 'None' and the input when compressing would not make it smaller
+        if Compression.check_codec(codec) == 'None' or not data:
+            return 'None', data
+        if codec == 'zlib':
+            compressed = zlib.compress(data, 9)
+        elif codec == 'lzma':
+            import lzma
+            compressed = lzma.compress(data, format=lzma.FORMAT_RAW, filters=Compression._lzma_filters()) # raw stream, no xz container overhead
+        else:
+            import bz2
+            compressed = bz2.compress(data, 9)
+        if len(compressed) >= len(data): # short or already dense payloads, every byte costs pixels so keep the raw data
+            return 'None', data
+        return codec, compressed
+
+    @staticmethod
+    def decompress(data, codec, limit=None): # limit is the most bytes the payload may expand to, LIMIT when None
+        if Compression.check_codec(codec) == 'None':
+            return data
+        limit = Compression.LIMIT if limit is None else limit
+        try:
+            if codec == 'zlib':
+                decompressor = zlib.decompressobj()
+            elif codec == 'lzma':
+                import lzma
+                decompressor = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=Compression._lzma_filters(decoder=True))
+            else:
+                import bz2
+                decompressor = bz2.BZ2Decompressor()
+            data = decompressor.decompress(data, limit + 1) # one byte past the limit tells an oversized stream from one of exactly limit bytes
+        except Exception as e: # zlib.error, lzma.LZMAError and OSError from bz2 all mean a corrupt stream
+            raise ValueError(f"Could not decompress {codec} payload: {e}") from e
+        if len(data) > limit:
+            raise ValueError(f"Decompressed {codec} payload exceeds the limit of {limit} bytes")
+        if not decompressor.eof:
+            raise ValueError(f"Could not decompress {codec} payload: stream is truncated")
+        return data
@@ -1,27 +1,44 @@
-import random
+import numpy as np
 from PIL import Image
 
 class Noise:
     @staticmethod
-    def add_noise(image, noise_level, data_length):
-        new_image = image.copy() # copy image and get width, height, and pixel data
-        width, height = new_image.size
-        pixels = new_image.load()
+    def add_noise(image, noise_level, protected_pixels, seed=None, protected_indices=None):
+        pixel_array = np.array(image) # copy image, the noise is added to the copy
+        return Image.fromarray(Noise.add_noise_array(pixel_array, noise_level, protected_pixels, seed, protected_indices))
 
-        noise_level_int = int(noise_level * 1000)  # convert to int, *1000 to ensure not a float
-        skip_pixels = data_length * 8 * 3  # calc no. pixels to skip based on data length (*8 for bits, *3 for rgb)
+    @staticmethod
+    def add_noise_array(pixel_array, noise_level, protected_pixels, seed=None, protected_indices=None): # in place on a writable (height, width, channels) array
+        # protected_pixels is the number of leading pixels (scan order) the embedding algorithm touched, see footprint()
+        # protected_indices optionally lists further flat pixel indices to skip, for payloads scattered over the image
+        height, width = pixel_array.shape[:2] # get width, height, and pixel data
+        pixel_count = width * height
+        if protected_pixels >= pixel_count:
+            return pixel_array
 
-        for _ in range(noise_level_int):
-            x, y = random.randint(0, width - 1), random.randint(0, height - 1) # generate random pixel coordinates
-            pixel_index = y * width + x # pixel index used to skip pixels
-            if pixel_index < skip_pixels: # skip pixels containing embedded data
-                continue
-            r, g, b = pixels[x, y] # get pixel's rgb
-            noise = random.randint(-int(noise_level), int(noise_level))  # generate random noise
-            pixels[x, y] = (Noise._clamp(r + noise), Noise._clamp(g + noise), Noise._clamp(b + noise))  # actually add noise
+        targets, totals = Noise.draw(pixel_count, noise_level, seed)
+        keep = targets >= protected_pixels # skip pixels containing embedded data
+        if protected_indices is not None: # one scatter into a pixel mask, no sort or hash of the whole selection
+            protected = np.zeros(pixel_count, dtype=bool)
+            protected[protected_indices] = True
+            keep &= ~protected[targets]
+        Noise.apply(pixel_array.reshape(-1, pixel_array.shape[-1]), targets[keep], totals[keep])
+        return pixel_array
 
-        return new_image
+    @staticmethod
+    def draw(pixel_count, noise_level, seed=None): # all noise for an image as (sorted pixel indices, summed offsets)
+        noise_level_int = int(noise_level * 1000) # convert to int, *1000 to ensure not a float
+        amplitude = int(noise_level)
+        if noise_level_int <= 0 or amplitude <= 0 or pixel_count <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int16)
+        rng = np.random.default_rng(seed) # seeded generator so noise can be reproduced, fresh entropy if seed is None
+        indices = rng.integers(0, pixel_count, noise_level_int) # all random pixel coordinates in one call
+        offsets = rng.integers(-amplitude, amplitude + 1, noise_level_int) # generate random noise
+        targets, inverse = np.unique(indices, return_inverse=True) # pixels hit more than once accumulate their noise
+        totals = np.bincount(inverse, weights=offsets).astype(np.int16)
+        return targets, totals
 
     @staticmethod
-    def _clamp(value):
-        return max(0, min(255, value))  # ensure value is within range [0, 255] (inclusive) (rgb)
+    def apply(pixels, targets, totals): # pixels is a (pixel, channel) view, targets index into it
+        noisy = pixels[targets, :3].astype(np.int16) + totals[:, None] # same offset on r, g and b
+        pixels[targets, :3] = np.clip(noisy, 0, 255) # ensure value is within range [0, 255] (inclusive) (rgb)
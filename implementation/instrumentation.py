@@ -0,0 +1,167 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+# per stage timing for the steganography pipeline: load, convert, encrypt, embed, noise, save, extract, decrypt
+# every stage reports wall time plus the bytes and pixels it processed to the registered sinks,
+# with no sinks registered stage() hands back a shared no-op object, so a disabled stage costs one list check
+# usage: instrumentation.add_sink(MemorySink()) ... sink.events
+
+_sinks = []
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+def configure_logging(filename='steganography.log', level=logging.INFO): # called by entry points, library modules only get loggers
+    logging.basicConfig(filename=filename, level=level, format=LOG_FORMAT)
+
+class MemorySink: # keeps every event in a list, for tests, benchmarks and the gui
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def totals(self): # seconds, bytes and pixels summed per stage
+        totals = {}
+        with self._lock:
+            for event in self.events:
+                total = totals.setdefault(event['stage'], {'count': 0, 'seconds': 0.0, 'bytes': 0, 'pixels': 0})
+                total['count'] += 1
+                for field in ('seconds', 'bytes', 'pixels'):
+                    total[field] += event[field]
+        return totals
+
+class JsonLinesSink: # appends one json object per stage to a file, flushed so a crashed run keeps its timings
+    def __init__(self, path):
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        line = json.dumps(event) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ProfileSink: # runs cProfile inside every stage, dump() writes stats readable with pstats or snakeviz
+    def __init__(self):
+        import cProfile # profiling modules load only when profiling is asked for
+        self.profiler = cProfile.Profile()
+        self._lock = threading.Lock() # one profiler can only be active once, concurrent stages are timed but not profiled
+        self._owner = None
+
+    def record(self, event):
+        pass # call statistics live in the profiler
+
+    def start(self, stage):
+        if self._lock.acquire(blocking=False):
+            try:
+                self.profiler.enable()
+            except ValueError: # another profiler is already active in this interpreter
+                self._lock.release()
+                return
+            self._owner = stage
+
+    def stop(self, stage):
+        if self._owner is stage:
+            self.profiler.disable()
+            self._owner = None
+            self._lock.release()
+
+    def dump(self, path):
+        self.profiler.dump_stats(path)
+
+    def print_stats(self, limit=25, stream=None):
+        import pstats
+        pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+
+class _Stage:
+    __slots__ = ('name', 'bytes', 'pixels', '_start')
+
+    def __init__(self, name, nbytes, pixels):
+        self.name = name
+        self.bytes = nbytes
+        self.pixels = pixels
+
+    def update(self, nbytes=None, pixels=None): # counts that are only known once the stage has run
+        if nbytes is not None:
+            self.bytes = nbytes
+        if pixels is not None:
+            self.pixels = pixels
+
+    def __enter__(self):
+        for sink in _sinks:
+            if isinstance(sink, ProfileSink):
+                sink.start(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self._start
+        event = {'stage': self.name, 'seconds': seconds, 'bytes': self.bytes, 'pixels': self.pixels,
+                 'ok': exc_type is None, 'pid': os.getpid(), 'thread': threading.get_ident(), 'time': time.time()}
+        for sink in _sinks:
+            if isinstance(sink, ProfileSink):
+                sink.stop(self)
+            sink.record(event)
+        return False
+
+class _DisabledStage:
+    __slots__ = ()
+
+    def update(self, nbytes=None, pixels=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_DISABLED = _DisabledStage()
+
+def stage(name, nbytes=0, pixels=0): # with stage('embed', len(payload)) as s: ... s.update(pixels=...)
+    if not _sinks:
+        return _DISABLED
+    return _Stage(name, nbytes, pixels)
+
+def run_job(result, work): # shared by the batch, conversion and metrics runners, never raises so one bad item cannot stop the rest
+    # work() returns the fields to add to result (or None), a failure is recorded in result instead
+    start = time.perf_counter()
+    try:
+        result.update(work() or {})
+        result['status'] = 'ok'
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = round(time.perf_counter() - start, 6)
+    return result
+
+def add_sink(sink):
+    _sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+def enabled():
+    return bool(_sinks)
+
+def enable(timings_path=None, profile_path=None): # file sinks for an entry point, the profile is written at exit
+    if timings_path:
+        sink = add_sink(JsonLinesSink(timings_path))
+        atexit.register(sink.close)
+    if profile_path:
+        sink = add_sink(ProfileSink())
+        atexit.register(sink.dump, profile_path)
+
+def configure_from_environment(): # STEGANOGRAPHY_TIMINGS=path.jsonl and/or STEGANOGRAPHY_PROFILE=path.prof
+    enable(os.environ.get('STEGANOGRAPHY_TIMINGS'), os.environ.get('STEGANOGRAPHY_PROFILE'))
@@ -1,10 +1,55 @@
+import time
+_STARTED = time.perf_counter() # before any other import, so the startup measurement includes them
+import argparse
+import re
+import subprocess
+import sys
 from PyQt6.QtWidgets import QApplication
-from ui.main_window import MainWindow
+from PyQt6.QtCore import QTimer
+
+# root file for ease of execution
+# --startup-budget SECONDS opens the window, reports the time until the first tab is usable and exits,
+# with status 1 when that took longer than the budget (use QT_QPA_PLATFORM=offscreen on machines without a display)
+# --import-report N reruns the same check under python -X importtime and lists the N slowest top-level imports
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Image steganography GUI.')
+    parser.add_argument('--startup-budget', type=float, metavar='SECONDS', help='measure startup, exit 1 when over budget')
+    parser.add_argument('--import-report', type=int, nargs='?', const=15, metavar='N', help='list the slowest imports during startup')
+    return parser.parse_args(argv)
+
+def import_report(budget, count): # runs a startup check in a child interpreter with import timing enabled
+    budget = 'inf' if budget is None else str(budget)
+    child = subprocess.run([sys.executable, '-X', 'importtime', __file__, '--startup-budget', budget], capture_output=True, text=True)
+    timings = []
+    for line in child.stderr.splitlines(): # import time: self [us] | cumulative | imported package
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (\S.*)$', line) # top-level imports only, nested ones are indented
+        if match:
+            timings.append((int(match.group(2)), match.group(3)))
+    for cumulative, module in sorted(timings, reverse=True)[:count]:
+        print(f"{cumulative / 1000:9.1f} ms  {module}")
+    print(child.stdout, end='')
+    return child.returncode
+
+def report_startup(window, budget): # runs once the event loop is idle, after the first page was built
+    window.ensure_page(window.tabs.currentIndex())
+    elapsed = time.perf_counter() - _STARTED
+    print(f"startup: {elapsed:.3f}s (budget {budget:.3f}s)")
+    QApplication.instance().exit(0 if elapsed <= budget else 1)
 
 if __name__ == "__main__":
-    app = QApplication([]) # root file for ease of execution
+    args = parse_args()
+    if args.import_report:
+        sys.exit(import_report(args.startup_budget, args.import_report))
+    import instrumentation
+    from ui.main_window import MainWindow
+    instrumentation.configure_logging() # action log next to the working directory, as before
+    instrumentation.configure_from_environment() # STEGANOGRAPHY_TIMINGS / STEGANOGRAPHY_PROFILE
+    app = QApplication([])
     window = MainWindow()
     window.show()
-    app.exec()
+    if args.startup_budget is not None:
+        QTimer.singleShot(0, lambda: report_startup(window, args.startup_budget))
+    sys.exit(app.exec())
 
-# <@This is a test message, and despite the unusual use of punctuation, 1283427538690 is purely to test steganography functionality \/??>@~{:=-()#>
\ No newline at end of file
+# <@This is a test message, and despite the unusual use of punctuation, 1283427538690 is purely to test steganography functionality \/??>@~{:=-()#>
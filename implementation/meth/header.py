@@ -0,0 +1,75 @@
+import struct
+import zlib
+
+class ImageTooSmall(ValueError): # raised by the payload readers when the image cannot hold the bytes asked for
+    pass
+
+class PayloadHeader:
+    # binary header written in front of every payload so extraction reads exactly the embedded length:
+    # magic (4) | version (1) | algorithm id (1) | flags (1) | payload length (4) | crc32 of payload (4)
+    MAGIC = b'STGO'
+    VERSION = 1
+    _STRUCT = struct.Struct('>4sBBBII')
+    SIZE = _STRUCT.size
+
+    ALGORITHMS = {'X Significant Bit': 1, 'Pixel Value Differencing': 2, 'X Significant Bit Packed': 3} # packed is xsb with bits_per_channel
+    ENCRYPTIONS = {'None': 0, 'Base64': 1, 'AES': 2, 'AES-CTR': 3} # stored in the low nibble of the flags byte, 'AES' is cbc mode
+    ENCRYPTION_MASK = 0x0F
+    COMPRESSIONS = {'None': 0, 'zlib': 1, 'lzma': 2, 'bz2': 3} # stored in the high nibble of the flags byte, see enc/compression.py
+    COMPRESSION_SHIFT = 4
+
+    @staticmethod
+    def encryption_flags(encryption):
+        if encryption not in PayloadHeader.ENCRYPTIONS:
+            raise ValueError(f"Unsupported encryption: {encryption}")
+        return PayloadHeader.ENCRYPTIONS[encryption]
+
+    @staticmethod
+    def encryption_name(flags):
+        code = flags & PayloadHeader.ENCRYPTION_MASK
+        for name, value in PayloadHeader.ENCRYPTIONS.items():
+            if value == code:
+                return name
+        raise ValueError(f"Unknown encryption id in header: {code}")
+
+    @staticmethod
+    def compression_flags(compression):
+        if compression not in PayloadHeader.COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        return PayloadHeader.COMPRESSIONS[compression] << PayloadHeader.COMPRESSION_SHIFT
+
+    @staticmethod
+    def compression_name(flags): # images written before compression existed have a zero high nibble, read as 'None'
+        code = flags >> PayloadHeader.COMPRESSION_SHIFT
+        for name, value in PayloadHeader.COMPRESSIONS.items():
+            if value == code:
+                return name
+        raise ValueError(f"Unknown compression id in header: {code}")
+
+    @staticmethod
+    def frame(algorithm, payload, flags=0): # returns header + payload in one bytearray, ready to embed
+        if algorithm not in PayloadHeader.ALGORITHMS:
+            raise ValueError(f"Unsupported algorithm: {algorithm}")
+        framed = bytearray(PayloadHeader.SIZE + len(payload))
+        PayloadHeader._STRUCT.pack_into(framed, 0, PayloadHeader.MAGIC, PayloadHeader.VERSION, PayloadHeader.ALGORITHMS[algorithm],
+                                        flags, len(payload), zlib.crc32(payload))
+        framed[PayloadHeader.SIZE:] = payload
+        return framed
+
+    @staticmethod
+    def parse(raw): # returns the header fields as a dict, or None if raw does not start with a header (legacy image)
+        if len(raw) < PayloadHeader.SIZE:
+            return None
+        magic, version, algorithm, flags, length, checksum = PayloadHeader._STRUCT.unpack(bytes(raw[:PayloadHeader.SIZE]))
+        if magic != PayloadHeader.MAGIC:
+            return None
+        if version != PayloadHeader.VERSION:
+            raise ValueError(f"Unsupported payload header version: {version}")
+        return {'version': version, 'algorithm': algorithm, 'flags': flags, 'length': length, 'checksum': checksum}
+
+    @staticmethod
+    def verify(header, payload): # raises if the payload does not match the recorded length and checksum
+        if len(payload) != header['length']:
+            raise ValueError(f"Payload length mismatch: expected {header['length']} bytes, read {len(payload)}")
+        if zlib.crc32(payload) != header['checksum']:
+            raise ValueError("Payload checksum mismatch, the image may be corrupted or the config is wrong")
@@ -1,5 +1,6 @@
 from PIL import Image
 import numpy as np
+from meth.header import ImageTooSmall
 
 class PVDAlgorithm:
     # range table defines pixel difference ranges and bits that can be stored:
@@ -14,6 +15,15 @@ class PVDAlgorithm:
         (128, 255) # dramatic changes: 7 bits - maximum capacity
     )
     BITS_PER_RANGE = (3, 3, 4, 5, 6, 7) # lookup table for quick bit capacity checks
+    BACKENDS = ('scalar', 'numpy') # scalar is the original per-pair path, numpy the array path
+    DEFAULT_BACKEND = 'numpy'
+    END_MARKER = b'###END###'
+
+    # per-difference lookup tables (0-255) so whole difference maps can be classified at once
+    _DIFF_RANGE = np.array([0] * 8 + [1] * 8 + [2] * 16 + [3] * 32 + [4] * 64 + [5] * 128, dtype=np.uint8)
+    _DIFF_BITS = np.array(BITS_PER_RANGE, dtype=np.int64)[_DIFF_RANGE]
+    _DIFF_LOWER = np.array([lower for lower, _ in RANGE_TABLE], dtype=np.int16)[_DIFF_RANGE]
+    _BIT_SLOTS = np.arange(7) # a pair never carries more than 7 bits
 
     @staticmethod
     def _get_range_index(diff): # optimized range lookup - avoids binary search
@@ -25,11 +35,31 @@ class PVDAlgorithm:
         return 5
 
     @staticmethod
-    def embed(image, data): # embed data using PVD - modifies pixel pairs based on their difference
+    def _resolve_backend(backend):
+        backend = backend or PVDAlgorithm.DEFAULT_BACKEND
+        if backend not in PVDAlgorithm.BACKENDS:
+            raise ValueError(f"Unsupported backend: {backend}")
+        return backend
+
+    @staticmethod
+    def _pair_views(pixel_array, rows): # views of the left/right pixel of every pair in the first rows, (row, pair, channel) order
+        pair_width = (pixel_array.shape[1] // 2) * 2 # an odd last column is never paired
+        return pixel_array[:rows, 0:pair_width:2, :3], pixel_array[:rows, 1:pair_width:2, :3]
+
+    @staticmethod
+    def embed(image, data, backend=None, end_marker=True): # embed data using PVD - modifies pixel pairs based on their difference
+        # end_marker=False is used for header-framed payloads: no marker is appended and the last pair is zero padded
         if not data:
             raise ValueError('Data is empty')
+        if PVDAlgorithm._resolve_backend(backend) == 'numpy':
+            return PVDAlgorithm._embed_numpy(image, data, end_marker)
+        return PVDAlgorithm._embed_scalar(image, data, end_marker)
+
+    @staticmethod
+    def _embed_scalar(image, data, end_marker=True):
         pixel_array = np.array(image) # convert to numpy array for faster operations
-        binary_data = ''.join(format(byte, '08b') for byte in data + b'###END###') # add end marker for extraction
+        marker = PVDAlgorithm.END_MARKER if end_marker else b''
+        binary_data = ''.join(format(byte, '08b') for byte in bytes(data) + marker) # add end marker for extraction
         height, width = pixel_array.shape[:2]
         data_index = 0 # tracks position in binary data string
         data_len = len(binary_data)
@@ -54,7 +84,8 @@ class PVDAlgorithm:
                     lower = PVDAlgorithm.RANGE_TABLE[range_idx][0] # lower bound of range
                     
                     # extract bits to embed and calculate new difference to achieve
-                    to_embed = int(binary_data[data_index:data_index + num_bits], 2)
+                    chunk = binary_data[data_index:data_index + num_bits]
+                    to_embed = int(chunk if end_marker else chunk.ljust(num_bits, '0'), 2)
                     new_diff = lower + to_embed # target difference after embedding
                     
                     # adjust pixel values to achieve new difference while minimizing changes
@@ -81,10 +112,181 @@ class PVDAlgorithm:
                     pixel_array[y, x, c] = p1_new
                     pixel_array[y, x + 1, c] = p2_new
                     data_index += num_bits
+        if data_index < data_len:
+            raise ValueError(f"Data too large for image: {data_len} bits, image holds {data_index}")
         return Image.fromarray(pixel_array)
 
     @staticmethod
-    def extract(image): # extract hidden data by reading pixel pair differences
+    def _embed_numpy(image, data, end_marker=True):
+        pixel_array = np.array(image)
+        marker = PVDAlgorithm.END_MARKER if end_marker else b''
+        bits = np.unpackbits(np.frombuffer(bytes(data) + marker if marker else data, dtype=np.uint8)) # add end marker for extraction
+        data_len = bits.size
+        height, width = pixel_array.shape[:2]
+        pairs_per_row = (width // 2) * 3
+        if pairs_per_row == 0:
+            raise ValueError("Data too large for image: image is too narrow to form pixel pairs")
+        max_pairs = -(-data_len // 3) # every pair carries at least 3 bits
+        rows = min(height, -(-max_pairs // pairs_per_row)) # only the rows that can be reached are classified
+        left, right = PVDAlgorithm._pair_views(pixel_array, rows)
+        p1 = left.reshape(-1).astype(np.int16)
+        p2 = right.reshape(-1).astype(np.int16)
+        count, data_index = PVDAlgorithm._embed_pairs(p1, p2, bits, 0, end_marker)
+        if data_index < data_len:
+            raise ValueError(f"Data too large for image: {data_len} bits, image holds {data_index}")
+        left[...] = p1.reshape(left.shape) # scatter the pairs back through the views
+        right[...] = p2.reshape(right.shape)
+        return Image.fromarray(pixel_array)
+
+    @staticmethod
+    def _embed_pairs(p1, p2, bits, offset=0, end_marker=True):
+        # embeds bits[offset:] into a run of int16 pairs in place, returns (pairs used, offset of the next unembedded bit)
+        data_len = bits.size
+        # capacities depend only on the original differences, so bit offsets are a prefix sum
+        diff = np.abs(p2 - p1)
+        num_bits = PVDAlgorithm._DIFF_BITS[diff]
+        offsets = np.cumsum(num_bits) - num_bits + offset # first payload bit of each pair
+        count = int(np.searchsorted(offsets, data_len)) # pairs that receive data
+        if count == 0:
+            return 0, offset
+        next_offset = int(offsets[count - 1] + num_bits[count - 1])
+        diff, num_bits, offsets = diff[:count], num_bits[:count], offsets[:count]
+        a, b = p1[:count], p2[:count]
+
+        # gather each pair's bits, with an end marker the last pair may get fewer bits which are read unpadded (as int('10', 2))
+        take = np.minimum(num_bits, data_len - offsets) if end_marker else num_bits
+        padded = np.concatenate((bits, np.zeros(7, dtype=np.uint8)))
+        shifts = take[:, None] - 1 - PVDAlgorithm._BIT_SLOTS
+        gathered = padded[offsets[:, None] + PVDAlgorithm._BIT_SLOTS].astype(np.int64)
+        to_embed = np.where(shifts >= 0, gathered << np.maximum(shifts, 0), 0).sum(axis=1)
+        new_diff = PVDAlgorithm._DIFF_LOWER[diff] + to_embed # target difference after embedding
+
+        # same adjustment rules as the scalar path: keep ordering, move one pixel of the pair
+        ascending = a <= b
+        grow = new_diff > diff
+        p1_new = np.where(ascending, np.where(grow, a, b - new_diff), np.where(grow, b + new_diff, a))
+        p2_new = np.where(ascending, np.where(grow, a + new_diff, b), np.where(grow, b, a - new_diff))
+        p1[:count] = np.clip(p1_new, 0, 255) # clamp values to valid pixel range (0-255)
+        p2[:count] = np.clip(p2_new, 0, 255)
+        return count, next_offset
+
+    @staticmethod
+    def extract(image, backend=None): # extract hidden data by reading pixel pair differences
+        if PVDAlgorithm._resolve_backend(backend) == 'numpy':
+            return PVDAlgorithm._extract_numpy(image)
+        return PVDAlgorithm._extract_scalar(image)
+
+    @staticmethod
+    def _pair_bits(p1, p2): # bitstream carried by a run of pairs, msb first per pair
+        diff = np.abs(p2.astype(np.int16) - p1.astype(np.int16))
+        num_bits = PVDAlgorithm._DIFF_BITS[diff]
+        embedded = diff - PVDAlgorithm._DIFF_LOWER[diff] # remove range offset to get embedded value
+        shifts = num_bits[:, None] - 1 - PVDAlgorithm._BIT_SLOTS
+        bits = (embedded[:, None] >> np.maximum(shifts, 0)) & 1
+        return bits[shifts >= 0].astype(np.uint8) # row-major boolean indexing keeps the per-pair bit order
+
+    @staticmethod
+    def _extract_numpy(image):
+        data = PVDAlgorithm._extract_marked(image, ascii_only=True)
+        if data is None:
+            return '' # the scalar path can never ascii-decode once a non-ascii byte is read
+        return data.decode('ascii')
+
+    @staticmethod
+    def extract_bytes(image): # marker-terminated data as bytes, binary safe and without a size cap
+        return PVDAlgorithm._extract_marked(image, ascii_only=False)
+
+    @staticmethod
+    def _extract_marked(image, ascii_only): # bytes before the end marker (everything if there is none), None once ascii_only fails
+        pixel_array = np.asarray(image)
+        height = pixel_array.shape[0]
+        marker = PVDAlgorithm.END_MARKER
+        bytes_data = bytearray()
+        carry = np.empty(0, dtype=np.uint8) # bits of an unfinished byte between bands
+        start, band_rows = 0, 1
+        while start < height: # bands double in size so short messages stop after a few rows
+            left, right = PVDAlgorithm._pair_views(pixel_array[start:start + band_rows], band_rows)
+            bits = np.concatenate((carry, PVDAlgorithm._pair_bits(left.reshape(-1), right.reshape(-1))))
+            whole = (bits.size // 8) * 8
+            searched = len(bytes_data)
+            chunk = np.packbits(bits[:whole])
+            carry = bits[whole:]
+            bytes_data += chunk.tobytes()
+            found = bytes_data.find(marker, max(0, searched - len(marker) + 1))
+            end = found + len(marker) if found >= 0 else len(bytes_data)
+            if ascii_only and not bytes_data[searched:end].isascii():
+                return None
+            if found >= 0: # found end marker
+                del bytes_data[found:]
+                return bytes_data
+            start += band_rows
+            band_rows *= 2
+        return bytes_data # no end marker, return everything read
+
+    @staticmethod
+    def capacity(image): # number of bytes the image can hold, summed over the capacity of every pair
+        pixel_array = np.asarray(image)
+        total_bits = 0
+        for start in range(0, pixel_array.shape[0], 256): # bands of rows keep the temporary difference map small
+            left, right = PVDAlgorithm._pair_views(pixel_array[start:start + 256], 256)
+            diff = np.abs(right.astype(np.int16) - left.astype(np.int16))
+            total_bits += int(PVDAlgorithm._DIFF_BITS[diff].sum())
+        return total_bits // 8
+
+    @staticmethod
+    def footprint(image, data_length): # number of leading pixels (scan order) modified when embedding a framed payload
+        pixel_array = np.asarray(image)
+        width = pixel_array.shape[1]
+        pairs_per_row = (width // 2) * 3
+        if pairs_per_row == 0:
+            return 0
+        data_len = data_length * 8
+        rows = min(pixel_array.shape[0], -(-data_len // (3 * pairs_per_row))) # every pair carries at least 3 bits
+        left, right = PVDAlgorithm._pair_views(pixel_array, rows)
+        diff = np.abs(right.reshape(-1).astype(np.int16) - left.reshape(-1).astype(np.int16))
+        offsets = np.cumsum(PVDAlgorithm._DIFF_BITS[diff]) - PVDAlgorithm._DIFF_BITS[diff]
+        count = int(np.searchsorted(offsets, data_len)) # pairs that receive data
+        return PVDAlgorithm._pairs_footprint(count, width)
+
+    @staticmethod
+    def _pairs_footprint(count, width): # leading pixels covered by the first count channel pairs of a band or image
+        if count == 0:
+            return 0
+        position = (count - 1) // 3 # pixel pair of the last used channel pair
+        y, x = divmod(position, width // 2)
+        return y * width + 2 * x + 2 # up to and including the right pixel of that pair
+
+    @staticmethod
+    def embed_band(band, bits, offset): # embeds bits[offset:] into a (rows, width, 3) band in place, framed payloads only
+        # returns the offset of the next unembedded bit and the number of leading band pixels modified
+        left, right = PVDAlgorithm._pair_views(band, band.shape[0])
+        p1 = left.reshape(-1).astype(np.int16)
+        p2 = right.reshape(-1).astype(np.int16)
+        count, next_offset = PVDAlgorithm._embed_pairs(p1, p2, bits, offset, end_marker=False)
+        if count:
+            left[...] = p1.reshape(left.shape)
+            right[...] = p2.reshape(right.shape)
+        return next_offset, PVDAlgorithm._pairs_footprint(count, band.shape[1])
+
+    @staticmethod
+    def band_bits(band): # bitstream carried by every pair of a (rows, width, 3) band
+        left, right = PVDAlgorithm._pair_views(band, band.shape[0])
+        return PVDAlgorithm._pair_bits(left.reshape(-1), right.reshape(-1))
+
+    @staticmethod
+    def read_bytes(image, count): # read exactly count bytes from the start of the image, used for header-framed payloads
+        pixel_array = np.asarray(image)
+        needed = count * 8
+        pairs_per_row = (pixel_array.shape[1] // 2) * 3
+        rows = min(pixel_array.shape[0], -(-needed // (3 * pairs_per_row))) if pairs_per_row else 0 # every pair carries at least 3 bits
+        left, right = PVDAlgorithm._pair_views(pixel_array, rows)
+        bits = PVDAlgorithm._pair_bits(left.reshape(-1), right.reshape(-1))
+        if bits.size < needed:
+            raise ImageTooSmall(f"Image too small to hold {count} bytes")
+        return np.packbits(bits[:needed]).tobytes()
+
+    @staticmethod
+    def _extract_scalar(image):
         pixel_array = np.array(image)
         height, width = pixel_array.shape[:2]
         bytes_data = bytearray() # stores extracted bytes
@@ -0,0 +1,86 @@
+import hashlib
+import numpy as np
+
+# keyed scatter order: instead of filling pixels from the top left, the payload goes to the pixels (xsb) or horizontal
+# pixel pairs (pvd) visited in a key-derived pseudo-random order. the order is a format preserving permutation
+# (a balanced feistel network over the next even power of two, cycle walking back into range), so position i of the
+# order is computed on its own, and the first n positions come from one vectorized call over np.arange(n).
+# embedding gathers the selected pixels into a small contiguous "virtual image", runs the normal sequential
+# algorithm on it and scatters the result back, so every algorithm works unchanged at array speed.
+
+class PixelScatter:
+    ROUNDS = 8
+
+    def __init__(self, key, size): # permutation of range(size) derived from key
+        if not key:
+            raise ValueError("Scatter mode needs a non-empty scatter_key")
+        if size <= 0:
+            raise ValueError("Nothing to scatter over, the image has no pixels")
+        self.size = size
+        self._half_bits = max(1, (int(size - 1).bit_length() + 1) // 2) # domain 4**half_bits >= size, below 4 * size
+        self._mask = np.uint64((1 << self._half_bits) - 1)
+        digest = hashlib.blake2b(key.encode() if isinstance(key, str) else bytes(key), digest_size=8 * PixelScatter.ROUNDS,
+                                 person=b'stego-scatter').digest()
+        self._round_keys = np.frombuffer(digest, dtype='<u8').astype(np.uint64) # one 64 bit subkey per round
+
+    @staticmethod
+    def _mix(values): # splitmix64 finalizer, a counter based hash with good avalanche, wraps modulo 2**64
+        values = values ^ (values >> np.uint64(30))
+        values = values * np.uint64(0xBF58476D1CE4E5B9)
+        values = values ^ (values >> np.uint64(27))
+        values = values * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+    def _feistel(self, values): # bijection on [0, 4**half_bits)
+        shift = np.uint64(self._half_bits)
+        left = values >> shift
+        right = values & self._mask
+        for round_key in self._round_keys:
+            left, right = right, left ^ (self._mix(right ^ round_key) & self._mask)
+        return (left << shift) | right
+
+    def permute(self, positions): # scattered index of every position in [0, size), elementwise
+        out = self._feistel(np.asarray(positions, dtype=np.uint64))
+        outside = np.flatnonzero(out >= self.size)
+        while outside.size: # cycle walking, the domain is under 4x the size so few values need more than one extra pass
+            walked = self._feistel(out[outside])
+            out[outside] = walked
+            outside = outside[walked >= self.size]
+        return out.astype(np.int64)
+
+    def indices(self, count): # the first count scattered positions
+        if count > self.size:
+            raise ValueError(f"Data too large for image: needs {count} positions, image has {self.size}")
+        return self.permute(np.arange(count, dtype=np.uint64))
+
+    @staticmethod
+    def pixel_order(key, pixels, count): # flat pixel indices of the first count scattered pixels
+        height, width = pixels.shape[:2]
+        return PixelScatter(key, width * height).indices(count)
+
+    @staticmethod
+    def pair_order(key, pixels, count): # flat indices of the left pixels of the first count scattered horizontal pairs
+        height, width = pixels.shape[:2]
+        pairs_per_row = width // 2 # an odd last column is never paired, as in sequential pvd
+        order = PixelScatter(key, height * pairs_per_row).indices(count)
+        rows, columns = np.divmod(order, pairs_per_row)
+        return rows * width + columns * 2
+
+    @staticmethod
+    def pair_count(pixels): # horizontal pixel pairs available for pvd
+        return pixels.shape[0] * (pixels.shape[1] // 2)
+
+    @staticmethod
+    def gather(pixels, indices, group=1): # (len(indices), group, channels) virtual image, group consecutive pixels per index
+        flat = np.asarray(pixels).reshape(-1, pixels.shape[2] if pixels.ndim == 3 else 1)
+        if group == 1:
+            return flat[indices][:, None, :]
+        return flat[indices[:, None] + np.arange(group)]
+
+    @staticmethod
+    def scatter(pixels, indices, virtual): # copy of pixels with the virtual image written back to its positions
+        out = np.array(pixels)
+        flat = out.reshape(-1, out.shape[2] if out.ndim == 3 else 1)
+        virtual = np.asarray(virtual).reshape(len(indices), -1, flat.shape[1])
+        flat[indices[:, None] + np.arange(virtual.shape[1])] = virtual
+        return out
@@ -0,0 +1,251 @@
+import os
+import shutil
+import struct
+import numpy as np
+from meth.header import ImageTooSmall
+from meth.xsb import SignificantBit
+from meth.pvd import PVDAlgorithm
+from enc.noise import Noise
+
+# tiled embedding for covers too large to decode in memory: the cover file is copied and its pixel data
+# patched in place a band of rows at a time, so peak memory follows the band size rather than the image size
+
+class RasterFile:
+    # uncompressed 8-bit rgb raster whose rows can be read and rewritten in place:
+    # 24-bit bmp, binary ppm (P6, maxval 255) and baseline tiff (rgb, chunky, uncompressed strips)
+    EXTENSIONS = ('.bmp', '.ppm', '.tif', '.tiff')
+
+    def __init__(self, path, writable=False):
+        self._file = open(path, 'r+b' if writable else 'rb')
+        self._bgr = False # bmp stores blue, green, red
+        self._bottom_up = False # bmp stores the last row first unless its height is negative
+        try:
+            magic = self._file.read(4)
+            self._file.seek(0)
+            if magic[:2] == b'BM':
+                self._parse_bmp()
+            elif magic[:2] == b'P6':
+                self._parse_ppm()
+            elif magic in (b'II*\x00', b'MM\x00*'):
+                self._parse_tiff()
+            else:
+                raise ValueError("Unsupported image format for tiled mode, use an uncompressed BMP, PPM or TIFF")
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def _parse_bmp(self):
+        _, _, _, _, data_offset = struct.unpack('<2sIHHI', self._file.read(14))
+        _, width, height, _, bits, compression = struct.unpack('<IiiHHI', self._file.read(20))
+        if bits != 24 or compression != 0:
+            raise ValueError(f"Tiled mode needs an uncompressed 24-bit BMP, got {bits}-bit with compression {compression}")
+        self.width, self.height = width, abs(height)
+        self._bgr = True
+        self._bottom_up = height > 0
+        self._stride = (width * 3 + 3) // 4 * 4 # rows are padded to 4 bytes
+        self._strips = [(data_offset, self.height)]
+
+    def _parse_ppm(self):
+        self._file.read(2)
+        tokens, token = [], b''
+        while len(tokens) < 3: # width, height, maxval separated by whitespace and comments
+            char = self._file.read(1)
+            if not char:
+                raise ValueError("Truncated PPM header")
+            if char == b'#':
+                self._file.readline()
+            elif char.isspace():
+                if token:
+                    tokens.append(int(token))
+                    token = b''
+            else:
+                token += char
+        width, height, maxval = tokens
+        if maxval != 255:
+            raise ValueError(f"Tiled mode needs an 8-bit PPM, got maxval {maxval}")
+        self.width, self.height = width, height
+        self._stride = width * 3
+        self._strips = [(self._file.tell(), height)] # the single whitespace after maxval was consumed above
+
+    def _parse_tiff(self):
+        order = '<' if self._file.read(2) == b'II' else '>'
+        _, ifd_offset = struct.unpack(order + 'HI', self._file.read(6))
+        self._file.seek(ifd_offset)
+        (entry_count,) = struct.unpack(order + 'H', self._file.read(2))
+        entries = {}
+        for _ in range(entry_count):
+            tag, kind, count, value = struct.unpack(order + 'HHI4s', self._file.read(12))
+            entries[tag] = (kind, count, value)
+
+        def values(tag, default=None):
+            if tag not in entries:
+                if default is None:
+                    raise ValueError(f"TIFF is missing required tag {tag}")
+                return default
+            kind, count, value = entries[tag]
+            if kind not in (3, 4): # short, long
+                raise ValueError(f"Unsupported TIFF field type {kind} for tag {tag}")
+            size = 2 if kind == 3 else 4
+            fmt = order + ('H' if kind == 3 else 'I') * count
+            if size * count <= 4: # small values are stored inline
+                return list(struct.unpack(fmt, value[:size * count]))
+            self._file.seek(struct.unpack(order + 'I', value)[0])
+            return list(struct.unpack(fmt, self._file.read(size * count)))
+
+        width, height = values(256)[0], values(257)[0]
+        layout = (values(259, [1])[0], values(262)[0], values(277, [1])[0], values(284, [1])[0])
+        if layout != (1, 2, 3, 1) or any(bits != 8 for bits in values(258, [1])):
+            raise ValueError("Tiled mode needs an uncompressed 8-bit RGB TIFF with chunky strips")
+        rows_per_strip = min(values(278, [height])[0], height)
+        self.width, self.height = width, height
+        self._stride = width * 3
+        self._strips = [(offset, min(rows_per_strip, height - index * rows_per_strip))
+                        for index, offset in enumerate(values(273))]
+        self._rows_per_strip = rows_per_strip
+
+    def _segments(self, y0, y1): # (file offset, first row, end row) runs of rows that are contiguous on disk
+        if len(self._strips) == 1:
+            offset = self._strips[0][0]
+            first = self.height - y1 if self._bottom_up else y0 # bottom-up files store rows y1-1 .. y0 in that order
+            yield offset + first * self._stride, y0, y1
+            return
+        rows_per_strip = self._rows_per_strip
+        for strip in range(y0 // rows_per_strip, (y1 - 1) // rows_per_strip + 1):
+            start = max(y0, strip * rows_per_strip)
+            end = min(y1, (strip + 1) * rows_per_strip)
+            yield self._strips[strip][0] + (start - strip * rows_per_strip) * self._stride, start, end
+
+    def _to_rgb(self, raw):
+        if self._bottom_up:
+            raw = raw[::-1]
+        return raw[..., ::-1] if self._bgr else raw
+
+    def read_rows(self, y0, y1): # rows [y0, y1) as a (rows, width, 3) rgb array
+        band = np.empty((y1 - y0, self.width, 3), dtype=np.uint8)
+        for offset, start, end in self._segments(y0, y1):
+            self._file.seek(offset)
+            raw = self._file.read((end - start) * self._stride)
+            if len(raw) != (end - start) * self._stride:
+                raise ValueError("Truncated image data")
+            rows = np.frombuffer(raw, dtype=np.uint8).reshape(end - start, self._stride)[:, :self.width * 3]
+            band[start - y0:end - y0] = self._to_rgb(rows.reshape(end - start, self.width, 3))
+        return band
+
+    def write_rows(self, y0, band): # writes a (rows, width, 3) rgb array back over rows [y0, y0 + rows)
+        for offset, start, end in self._segments(y0, y0 + band.shape[0]):
+            rows = np.zeros((end - start, self._stride), dtype=np.uint8)
+            if self._stride != self.width * 3: # keep the existing row padding bytes
+                self._file.seek(offset)
+                rows[...] = np.frombuffer(self._file.read(rows.size), dtype=np.uint8).reshape(rows.shape)
+            rows[:, :self.width * 3] = self._to_rgb(band[start - y0:end - y0]).reshape(end - start, -1)
+            self._file.seek(offset)
+            self._file.write(rows.tobytes())
+
+class TiledEmbedder:
+    BAND_PIXELS = 1 << 18 # default band size, rows are derived from the image width
+
+    @staticmethod
+    def _band_rows(tile_rows, width):
+        return tile_rows or max(1, TiledEmbedder.BAND_PIXELS // max(1, width))
+
+    @staticmethod
+    def embed(input_path, output_path, payload, algorithm, bit_position=0, noise_level=0, seed=None, tile_rows=None,
+              bits_per_channel=None, progress=None):
+        # embeds a header-framed payload, the output keeps the cover's file format, returns the output path
+        # progress(fraction) is called after every band, an exception raised from it aborts and removes the output
+        if algorithm not in ('X Significant Bit', 'Pixel Value Differencing'):
+            raise ValueError(f"Unsupported algorithm: {algorithm}")
+        shutil.copyfile(input_path, output_path) # streamed copy, the pixel data is then patched in place
+        try:
+            with RasterFile(output_path, writable=True) as raster:
+                TiledEmbedder._embed_raster(raster, payload, algorithm, bit_position, noise_level, seed, tile_rows, bits_per_channel,
+                                            progress)
+        except Exception:
+            os.remove(output_path) # never leave a half embedded file behind
+            raise
+        return output_path
+
+    @staticmethod
+    def _embed_raster(raster, payload, algorithm, bit_position, noise_level, seed, tile_rows, bits_per_channel, progress=None):
+        width, height = raster.width, raster.height
+        tile_rows = TiledEmbedder._band_rows(tile_rows, width)
+        bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+        if bits_per_channel:
+            protected = SignificantBit.packed_footprint(len(payload), SignificantBit._check_packed_bits(bits_per_channel))
+            if protected > width * height:
+                raise ValueError(f"Data too large for image: needs {protected} pixels, image has {width * height}")
+        elif algorithm == 'X Significant Bit':
+            if SignificantBit.footprint(len(payload)) > width * height:
+                raise ValueError(f"Data too large for image: needs {len(payload) * 3} pixels, image has {width * height}")
+            protected = SignificantBit.footprint(len(payload))
+        else:
+            if width < 2:
+                raise ValueError("Data too large for image: image is too narrow to form pixel pairs")
+            protected = None # known once the band holding the last payload bit has been embedded
+        # noise positions are drawn for the whole image up front, as in Noise.add_noise, and applied band by band
+        targets, totals = Noise.draw(width * height, noise_level, seed)
+        offset = 0
+        for y0 in range(0, height, tile_rows):
+            y1 = min(height, y0 + tile_rows)
+            band_start, band_end = y0 * width, y1 * width # pixel range of the band
+            if protected is not None and band_start >= protected: # past the payload, only noise is left to apply
+                low, high = np.searchsorted(targets, (band_start, band_end))
+                if low == targets.size:
+                    break
+                if low == high:
+                    continue # band left untouched
+            band = raster.read_rows(y0, y1)
+            if bits_per_channel:
+                SignificantBit.embed_packed_band(band.reshape(-1), bits, bits_per_channel, band_start * 3)
+            elif algorithm == 'X Significant Bit':
+                SignificantBit.embed_band(band.reshape(-1), bits, bit_position, band_start * 3)
+            elif offset < bits.size:
+                offset, used = PVDAlgorithm.embed_band(band, bits, offset)
+                if offset >= bits.size:
+                    protected = band_start + used
+            if protected is not None: # noise only on pixels after the payload
+                low, high = np.searchsorted(targets, (max(band_start, protected), band_end))
+                Noise.apply(band.reshape(-1, 3), targets[low:high] - band_start, totals[low:high])
+            raster.write_rows(y0, band)
+            if progress is not None:
+                progress(y1 / height)
+        if protected is None:
+            raise ValueError(f"Data too large for image: {bits.size} bits, image holds {offset}")
+
+    @staticmethod
+    def read_bytes(path, count, algorithm, bit_position=0, tile_rows=None, bits_per_channel=None): # read exactly count bytes from the start
+        out = bytearray(count) # filled band by band, bits of a byte split across bands are carried over
+        values = np.frombuffer(out, dtype=np.uint8)
+        carry = np.empty(0, dtype=np.uint8)
+        filled = 0
+        with RasterFile(path) as raster:
+            tile_rows = TiledEmbedder._band_rows(tile_rows, raster.width)
+            for y0 in range(0, raster.height, tile_rows):
+                if filled >= count:
+                    break
+                band = raster.read_rows(y0, min(raster.height, y0 + tile_rows))
+                if bits_per_channel:
+                    bits = SignificantBit.packed_band_bits(band.reshape(-1), bits_per_channel, y0 * raster.width * 3, count)
+                elif algorithm == 'X Significant Bit':
+                    bits = SignificantBit.band_bits(band.reshape(-1), bit_position, y0 * raster.width * 3, count)
+                elif algorithm == 'Pixel Value Differencing':
+                    bits = PVDAlgorithm.band_bits(band)
+                else:
+                    raise ValueError(f"Unsupported algorithm: {algorithm}")
+                bits = np.concatenate((carry, bits[:(count - filled) * 8 - carry.size]))
+                whole = bits.size // 8
+                values[filled:filled + whole] = np.packbits(bits[:whole * 8])
+                carry = bits[whole * 8:]
+                filled += whole
+        if filled < count:
+            raise ImageTooSmall(f"Image too small to hold {count} bytes")
+        return out
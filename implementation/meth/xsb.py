@@ -1,8 +1,30 @@
+import numpy as np
+from PIL import Image
+from meth.header import ImageTooSmall
+
 class SignificantBit:
+    BACKENDS = ('scalar', 'numpy') # scalar is the original per-pixel path, numpy the array path
+    DEFAULT_BACKEND = 'numpy'
+    MAX_EXTRACT_CHARS = 10001 # matches the scalar safety check on extraction
+    PACKED_BITS = (1, 2, 3, 4) # bits per channel value in packed mode, which has no per-byte flag and needs the payload header
+
     @staticmethod
     def _transform_data_to_binary(data):
         return [format(byte, '08b') for byte in data] # convert data to binary
 
+    @staticmethod
+    def _dimensions(image): # (width, height) of a PIL image or a (height, width, channels) pixel array
+        if isinstance(image, np.ndarray):
+            return image.shape[1], image.shape[0]
+        return image.size
+
+    @staticmethod
+    def _resolve_backend(backend):
+        backend = backend or SignificantBit.DEFAULT_BACKEND
+        if backend not in SignificantBit.BACKENDS:
+            raise ValueError(f"Unsupported backend: {backend}")
+        return backend
+
     @staticmethod
     def _manipulate_pixels(pixels, data, bit_position):
         bit_position = min(7, max(0, bit_position)) # ensure bit_position is within valid range (0-7)
@@ -28,10 +50,20 @@ class SignificantBit:
             yield tuple(pixel_block[6:9])
 
     @staticmethod
-    def embed(image, data, bit_depth=8, bit_position=0): # embed data in image at specified bit position
+    def embed(image, data, bit_depth=8, bit_position=0, backend=None): # embed data in image at specified bit position
         if not data:
-            raise ValueError('Data is empty')            
+            raise ValueError('Data is empty')
         bit_position = min(7, max(0, bit_position)) # ensure bit_position is within valid range (0-7)
+        if SignificantBit._resolve_backend(backend) == 'numpy':
+            return SignificantBit._embed_numpy(image, data, bit_position)
+        return SignificantBit._embed_scalar(image, data, bit_position)
+
+    @staticmethod
+    def _embed_scalar(image, data, bit_position):
+        if isinstance(image, np.ndarray): # cached covers arrive as arrays, the scalar path works on a PIL image
+            image = Image.fromarray(image)
+        if len(data) * 3 > image.size[0] * image.size[1]:
+            raise ValueError(f"Data too large for image: needs {len(data) * 3} pixels, image has {image.size[0] * image.size[1]}")
         new_image = image.copy()
         width = new_image.size[0]
         x, y = 0, 0
@@ -44,8 +76,128 @@ class SignificantBit:
         return new_image
 
     @staticmethod
-    def extract(image, bit_depth=8, bit_position=0): # extract data from image at specified bit position
+    def _embed_numpy(image, data, bit_position):
+        pixel_array = np.array(image) # single copy of the pixel buffer
+        rgb = pixel_array if pixel_array.shape[2] == 3 else np.ascontiguousarray(pixel_array[..., :3]) # alpha (if any) is left untouched
+        data_length = len(data)
+        needed = data_length * 9 # 8 data values + 1 continue/stop flag per byte
+        if needed > rgb.size:
+            raise ValueError(f"Data too large for image: needs {needed // 3} pixels, image has {rgb.size // 3}")
+        blocks = rgb.reshape(-1)[:needed].reshape(data_length, 9) # view with one row of 9 channel values per byte
+        bit_mask = np.uint8(1 << bit_position)
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8)).reshape(data_length, 8) # msb first, same as format(byte, '08b')
+        blocks[:, :8] = (blocks[:, :8] & ~bit_mask) | (bits * bit_mask) # set or clear the bit plane for every data value at once
+        blocks[:, 8] |= bit_mask # more data follows
+        blocks[-1, 8] &= ~bit_mask # end of data marker on the last byte
+        if rgb is not pixel_array:
+            pixel_array[..., :3] = rgb # write the modified rgb values back next to the alpha channel
+        return Image.fromarray(pixel_array)
+
+    @staticmethod
+    def embed_band(channels, bits, bit_position, start):
+        # embeds the slice of the 9-values-per-byte layout that falls on flat rgb values [start, start + channels.size)
+        # bits is the unpacked payload, returns how many of the band's values were modified
+        bit_position = min(7, max(0, bit_position)) # ensure bit_position is within valid range (0-7)
+        data_length = bits.size // 8
+        end = min(start + channels.size, data_length * 9)
+        if end <= start:
+            return 0
+        block, slot = np.divmod(np.arange(start, end), 9) # byte and position within its 9 values
+        flags = (block < data_length - 1).astype(np.uint8) # more data follows, cleared on the last byte
+        values = np.where(slot < 8, bits[np.minimum(block * 8 + slot, bits.size - 1)], flags)
+        bit_mask = np.uint8(1 << bit_position)
+        segment = channels[:end - start]
+        segment[...] = (segment & ~bit_mask) | (values.astype(np.uint8) * bit_mask)
+        return end - start
+
+    @staticmethod
+    def band_bits(channels, bit_position, start, count):
+        # payload bits carried by flat rgb values [start, start + channels.size) when reading count bytes, flags are skipped
+        bit_position = min(7, max(0, bit_position)) # ensure bit_position is within valid range (0-7)
+        end = min(start + channels.size, count * 9)
+        if end <= start:
+            return np.empty(0, dtype=np.uint8)
+        slot = np.arange(start, end) % 9
+        return ((channels[:end - start] >> bit_position) & 1)[slot < 8]
+
+    @staticmethod
+    def _check_packed_bits(bits_per_channel):
+        if bits_per_channel not in SignificantBit.PACKED_BITS:
+            raise ValueError(f"Unsupported bits per channel: {bits_per_channel}, use 1 to 4")
+        return bits_per_channel
+
+    @staticmethod
+    def embed_packed(image, data, bits_per_channel): # payload bits packed k at a time into the k low bit planes of every rgb value
+        if not data:
+            raise ValueError('Data is empty')
+        k = SignificantBit._check_packed_bits(bits_per_channel)
+        pixel_array = np.array(image)
+        rgb = pixel_array if pixel_array.shape[2] == 3 else np.ascontiguousarray(pixel_array[..., :3]) # alpha (if any) is left untouched
+        needed = -(-len(data) * 8 // k) # channel values holding the payload
+        if needed > rgb.size:
+            raise ValueError(f"Data too large for image: needs {-(-needed // 3)} pixels, image has {rgb.size // 3}")
+        SignificantBit.embed_packed_band(rgb.reshape(-1), np.unpackbits(np.frombuffer(data, dtype=np.uint8)), k, 0)
+        if rgb is not pixel_array:
+            pixel_array[..., :3] = rgb
+        return Image.fromarray(pixel_array)
+
+    @staticmethod
+    def embed_packed_band(channels, bits, bits_per_channel, start):
+        # packed layout for flat rgb values [start, start + channels.size), returns how many values were modified
+        k = bits_per_channel
+        end = min(start + channels.size, -(-bits.size // k))
+        if end <= start:
+            return 0
+        chunk = bits[start * k:end * k]
+        if chunk.size < (end - start) * k: # the last value is zero padded
+            chunk = np.concatenate((chunk, np.zeros((end - start) * k - chunk.size, dtype=np.uint8)))
+        values = np.packbits(chunk.reshape(-1, k), axis=1).reshape(-1) >> (8 - k) # k bits per value, msb first
+        mask = np.uint8((1 << k) - 1)
+        segment = channels[:end - start]
+        segment[...] = (segment & ~mask) | values # replace the k low bit planes at once
+        return end - start
+
+    @staticmethod
+    def packed_band_bits(channels, bits_per_channel, start, count): # payload bits in flat rgb values [start, ...) when reading count bytes
+        k = bits_per_channel
+        end = min(start + channels.size, -(-count * 8 // k))
+        if end <= start:
+            return np.empty(0, dtype=np.uint8)
+        values = channels[:end - start] & np.uint8((1 << k) - 1)
+        return np.unpackbits(values[:, None], axis=1)[:, 8 - k:].reshape(-1)
+
+    @staticmethod
+    def read_packed(image, count, bits_per_channel): # read exactly count bytes of a packed payload
+        k = SignificantBit._check_packed_bits(bits_per_channel)
+        pixel_array = np.asarray(image)
+        pixels = pixel_array.reshape(-1, pixel_array.shape[-1])
+        used = SignificantBit.packed_footprint(count, k)
+        if used > len(pixels):
+            raise ImageTooSmall(f"Image too small to hold {count} bytes")
+        bits = SignificantBit.packed_band_bits(pixels[:used, :3].reshape(-1), k, 0, count)
+        return bytearray(np.packbits(bits[:count * 8]))
+
+    @staticmethod
+    def packed_capacity(image, bits_per_channel): # bytes the image holds in packed mode
+        width, height = SignificantBit._dimensions(image)
+        return width * height * 3 * SignificantBit._check_packed_bits(bits_per_channel) // 8
+
+    @staticmethod
+    def packed_footprint(data_length, bits_per_channel): # leading pixels modified in packed mode
+        values = -(-data_length * 8 // bits_per_channel) # channel values holding the payload
+        return -(-values // 3)
+
+    @staticmethod
+    def extract(image, bit_depth=8, bit_position=0, backend=None): # extract data from image at specified bit position
         bit_position = min(7, max(0, bit_position)) # ensure bit_position is within valid range (0-7)
+        if SignificantBit._resolve_backend(backend) == 'numpy':
+            return SignificantBit._extract_numpy(image, bit_position)
+        return SignificantBit._extract_scalar(image, bit_position)
+
+    @staticmethod
+    def _extract_scalar(image, bit_position):
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
         extracted_data = ''
         pixel_iterator = iter(image.getdata())
         bit_mask = 1 << bit_position # create bit mask (used to extract specific bit)
@@ -77,5 +229,59 @@ class SignificantBit:
                     break
         except Exception: # shouldn't happen, but just in case
             pass
-            
+
         return extracted_data # return the extracted data
+
+    @staticmethod
+    def _extract_numpy(image, bit_position):
+        return SignificantBit.extract_bytes(image, bit_position, SignificantBit.MAX_EXTRACT_CHARS).decode('latin1') # latin1 maps each byte to the same code point as chr()
+
+    @staticmethod
+    def extract_bytes(image, bit_position=0, limit=None): # flag-terminated data as bytes, no size cap unless limit is given
+        bit_position = min(7, max(0, bit_position)) # ensure bit_position is within valid range (0-7)
+        pixel_array = np.asarray(image)
+        pixels = pixel_array.reshape(-1, pixel_array.shape[-1]) # one row per pixel in scan order
+        block_count = len(pixels) // 3 # only complete 3 pixel blocks are read
+        if limit is not None:
+            block_count = min(block_count, limit)
+        bit_mask = np.uint8(1 << bit_position)
+        length, window = block_count, 4096
+        start = 0
+        while start < block_count: # windows double in size so short messages stop after a few pixels
+            end = min(block_count, start + window)
+            flags = pixels[start * 3 + 2:end * 3:3, 2] # 9th value of each block is the blue channel of its third pixel
+            stops = np.flatnonzero((flags & bit_mask) == 0) # blocks whose flag marks the end of data
+            if stops.size:
+                length = start + int(stops[0]) + 1
+                break
+            start, window = end, window * 2
+        return SignificantBit._pack_blocks(pixels, length, bit_mask)
+
+    @staticmethod
+    def _pack_blocks(pixels, count, bit_mask): # bytes carried by the first count blocks, into one preallocated buffer
+        out = bytearray(count)
+        values = np.frombuffer(out, dtype=np.uint8)
+        step = 1 << 20 # blocks per chunk, keeps the boolean temporaries bounded
+        for start in range(0, count, step):
+            end = min(count, start + step)
+            blocks = pixels[start * 3:end * 3, :3].reshape(end - start, 9)
+            values[start:end] = np.packbits((blocks[:, :8] & bit_mask) != 0, axis=1).reshape(-1) # rebuild bytes from the bit plane
+        return out
+
+    @staticmethod
+    def capacity(image): # number of bytes the image can hold, 3 pixels per byte
+        width, height = SignificantBit._dimensions(image)
+        return (width * height) // 3
+
+    @staticmethod
+    def footprint(data_length): # number of leading pixels (scan order) modified when embedding data_length bytes
+        return data_length * 3
+
+    @staticmethod
+    def read_bytes(image, count, bit_position=0): # read exactly count bytes from the start of the image, flags are ignored
+        bit_position = min(7, max(0, bit_position)) # ensure bit_position is within valid range (0-7)
+        pixel_array = np.asarray(image)
+        pixels = pixel_array.reshape(-1, pixel_array.shape[-1])
+        if count * 3 > len(pixels):
+            raise ImageTooSmall(f"Image too small to hold {count} bytes")
+        return SignificantBit._pack_blocks(pixels, count, np.uint8(1 << bit_position))
@@ -0,0 +1,188 @@
+import concurrent.futures
+import math
+import os
+import numpy as np
+from PIL import Image
+from cache import load_pixels
+from instrumentation import run_job, stage
+
+# distortion between a cover and its stego image: mse, psnr, ssim, histogram divergence and changed value counts
+# images are processed a band of rows at a time, so the temporaries stay small on any image size,
+# every metric is accumulated as per channel sums and only turned into a mean at the end
+# usage: ImageMetrics().compare('cover.png', 'cover_stego.png')['psnr']
+
+BAND_PIXELS = 1 << 16 # pixels per band, small enough for the int32 window sums to stay in cache
+SSIM_WINDOW = 7 # uniform 7x7 window, the usual default for ssim on photos
+SSIM_C1 = (0.01 * 255) ** 2 # stabilisers from the ssim paper for 8 bit values
+SSIM_C2 = (0.03 * 255) ** 2
+
+class ImageMetrics:
+    def __init__(self, tile_rows=None, workers=None):
+        self._tile_rows = tile_rows
+        self._workers = workers or os.cpu_count() or 1
+
+    @staticmethod
+    def _pixels(image): # (height, width, channels) uint8 array from a path, PIL image or array
+        if callable(image): # produced on demand, lets run() embed inside its worker threads
+            image = image()
+        if isinstance(image, str):
+            return load_pixels(image)
+        if isinstance(image, Image.Image):
+            return np.asarray(image if image.mode == 'RGB' else image.convert('RGB'))
+        pixels = np.asarray(image)
+        return pixels[:, :, None] if pixels.ndim == 2 else pixels
+
+    @staticmethod
+    def _window_sums(values, window, axis): # sums of every run of window values along axis
+        # built from power of two run sums (window 7 = 1 + 2 + 4), a handful of contiguous adds instead of a cumsum
+        def run(block, start, length):
+            index = [slice(None)] * block.ndim
+            index[axis] = slice(start, start + length)
+            return block[tuple(index)]
+
+        length = values.shape[axis] - window + 1
+        total = None
+        block, size, start = values, 1, 0
+        while True:
+            if window & 1:
+                part = run(block, start, length)
+                total = part.copy() if total is None else np.add(total, part, out=total)
+                start += size
+            window >>= 1
+            if not window:
+                return total
+            block = run(block, 0, block.shape[axis] - size) + run(block, size, block.shape[axis] - size)
+            size *= 2
+
+    @staticmethod
+    def _box_sums(values, window): # sum over every window x window block of a (channels, rows, width) array, separable
+        return ImageMetrics._window_sums(ImageMetrics._window_sums(values, window, 1), window, 2)
+
+    @staticmethod
+    def _ssim_sums(cover, stego, window): # (sum of the ssim map per channel, number of windows) for a band
+        # the ssim formula is rewritten over the window sums sx, sy, sxx + syy and sxy (means times n = window ** 2),
+        # every intermediate stays an exact int32 for 8 bit values and only the final ratio is taken in floating point
+        x = np.ascontiguousarray(cover.transpose(2, 0, 1), dtype=np.int32) # channel first, shifted adds run over whole rows
+        y = np.ascontiguousarray(stego.transpose(2, 0, 1), dtype=np.int32)
+        n = window * window
+        sx = ImageMetrics._box_sums(x, window)
+        sy = ImageMetrics._box_sums(y, window)
+        squares = ImageMetrics._box_sums(x * x + y * y, window)
+        sxy = ImageMetrics._box_sums(x * y, window)
+        product = sx * sy
+        means = sx * sx + sy * sy
+        numerator = (2 * product + SSIM_C1 * n * n) * (2 * (n * sxy - product) + SSIM_C2 * n * n)
+        denominator = (means + SSIM_C1 * n * n) * (n * squares - means + SSIM_C2 * n * n)
+        ssim = numerator / denominator
+        return ssim.sum(axis=(1, 2)), ssim.shape[1] * ssim.shape[2]
+
+    @staticmethod
+    def _histograms(values, channels): # (channels, 256) value counts of a (values, channels) array, every channel in one bincount
+        values = values.astype(np.int64) + np.arange(channels) * 256
+        return np.bincount(values.reshape(-1), minlength=256 * channels).reshape(channels, 256)
+
+    @staticmethod
+    def _js_divergence(first, second): # jensen-shannon divergence in bits per channel, 0 for equal histograms, at most 1
+        p = first / first.sum(axis=1, keepdims=True)
+        q = second / second.sum(axis=1, keepdims=True)
+        m = (p + q) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kl_p = np.where(p > 0, p * np.log2(p / m), 0.0).sum(axis=1)
+            kl_q = np.where(q > 0, q * np.log2(q / m), 0.0).sum(axis=1)
+        return (kl_p + kl_q) / 2
+
+    @staticmethod
+    def _psnr(mse):
+        return math.inf if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+    def compare(self, cover, stego): # cover and stego are paths, PIL images or arrays of the same size
+        cover = ImageMetrics._pixels(cover)
+        stego = ImageMetrics._pixels(stego)
+        if cover.shape != stego.shape:
+            raise ValueError(f"Image sizes differ: cover is {cover.shape}, stego is {stego.shape}")
+        height, width, channels = cover.shape
+        if height == 0 or width == 0:
+            raise ValueError("Image has no pixels")
+        rows = self._tile_rows or max(4 * SSIM_WINDOW, BAND_PIXELS // width) # ssim rereads window - 1 rows per band
+        window = min(SSIM_WINDOW, height, width) # tiny images use one window over the whole image
+        last_window = height - window # last row a window can start on
+
+        squared_error = np.zeros(channels, dtype=np.int64)
+        changed_values = np.zeros(channels, dtype=np.int64)
+        cover_histogram = np.zeros((channels, 256), dtype=np.int64)
+        stego_histogram = np.zeros((channels, 256), dtype=np.int64) # changes against the cover histogram, added at the end
+        ssim_sum = np.zeros(channels)
+        ssim_count = 0
+        changed_pixels = 0
+        max_difference = 0
+        with stage('metrics', pixels=height * width):
+            for y0 in range(0, height, rows):
+                y1 = min(height, y0 + rows)
+                cover_band, stego_band = cover[y0:y1], stego[y0:y1]
+                difference = stego_band.astype(np.int32) - cover_band.astype(np.int32)
+                squared_error += (difference * difference).reshape(-1, channels).sum(axis=0)
+                changed = difference != 0
+                changed_values += changed.reshape(-1, channels).sum(axis=0)
+                max_difference = max(max_difference, int(np.abs(difference).max()))
+                cover_histogram += ImageMetrics._histograms(cover_band.reshape(-1, channels), channels)
+                moved = changed.reshape(-1, channels).any(axis=1) # the stego histogram only differs where values changed
+                changed_pixels += int(np.count_nonzero(moved))
+                stego_histogram += (ImageMetrics._histograms(stego_band.reshape(-1, channels)[moved], channels)
+                                    - ImageMetrics._histograms(cover_band.reshape(-1, channels)[moved], channels))
+                if y0 <= last_window: # windows starting in this band reach window - 1 rows into the next one
+                    end = min(y1, last_window + 1) + window - 1
+                    sums, count = ImageMetrics._ssim_sums(cover[y0:end], stego[y0:end], window)
+                    ssim_sum += sums
+                    ssim_count += count
+
+        values = height * width
+        mse_per_channel = squared_error / values
+        ssim_per_channel = ssim_sum / ssim_count
+        divergence = ImageMetrics._js_divergence(cover_histogram, cover_histogram + stego_histogram)
+        mse = float(mse_per_channel.mean())
+        return {'width': width, 'height': height, 'channels': channels,
+                'mse': mse, 'psnr': ImageMetrics._psnr(mse), 'ssim': float(ssim_per_channel.mean()),
+                'histogram_divergence': float(divergence.mean()),
+                'changed_pixels': changed_pixels, 'changed_fraction': changed_pixels / values, 'max_difference': max_difference,
+                'mse_per_channel': mse_per_channel.tolist(),
+                'psnr_per_channel': [ImageMetrics._psnr(value) for value in mse_per_channel.tolist()],
+                'ssim_per_channel': ssim_per_channel.tolist(),
+                'histogram_divergence_per_channel': divergence.tolist(),
+                'changed_values_per_channel': changed_values.tolist()}
+
+    def _run_job(self, job):
+        cover, stego = job
+        result = {'cover': cover if isinstance(cover, str) else None, 'stego': stego if isinstance(stego, str) else None}
+        return run_job(result, lambda: self.compare(cover, stego))
+
+    def run(self, pairs, progress=None, on_result=None):
+        # measures (cover, stego) pairs on a thread pool (numpy and pillow release the gil), returns results in input order
+        # stego may be a callable returning the image, so an embed runs in the worker and only a few images are alive at once
+        # progress(fraction, stage) is called as pairs complete and may raise to stop, queued pairs are then dropped
+        pairs = list(pairs)
+        results = [None] * len(pairs)
+        failed = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self._workers, max(1, len(pairs)))) as executor:
+            futures = {executor.submit(self._run_job, pair): index for index, pair in enumerate(pairs)}
+            try:
+                for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    result = results[futures[future]] = future.result()
+                    failed += result['status'] != 'ok'
+                    if on_result is not None:
+                        on_result(result)
+                    if progress is not None:
+                        progress(done / len(pairs), f"Measured {done}/{len(pairs)} images, {failed} failed")
+            finally:
+                for future in futures:
+                    future.cancel() # running pairs finish, queued ones are dropped
+        return results
+
+    @staticmethod
+    def summary(results): # mean, min and max of the headline metrics over the successful results
+        ok = [result for result in results if result and result['status'] == 'ok']
+        summary = {'images': len(results), 'failed': len(results) - len(ok)}
+        for name in ('mse', 'psnr', 'ssim', 'histogram_divergence', 'changed_fraction'):
+            values = [result[name] for result in ok]
+            if values:
+                summary[name] = {'mean': sum(values) / len(values), 'min': min(values), 'max': max(values)}
+        return summary
@@ -0,0 +1,132 @@
+import concurrent.futures
+import math
+import numpy as np
+from meth.xsb import SignificantBit
+from meth.pvd import PVDAlgorithm
+from meth.header import PayloadHeader, ImageTooSmall
+from cache import load_pixels
+
+# decode side config auto-detection: every candidate embedding layout reads only the first few dozen bytes,
+# the candidates are scored concurrently and only the winner is decoded in full
+
+PROBE_BYTES = 48
+HEADER_SCORE = 1000.0 # a matching payload header beats any legacy guess
+MIN_SCORE = 16.0 # a handful of plausible characters, below this nothing was detected
+
+def _text_evidence(): # log2 likelihood ratio of every byte value under a rough text model against uniform random bytes
+    lower = range(ord('a'), ord('z') + 1)
+    upper = range(ord('A'), ord('Z') + 1)
+    digits = range(ord('0'), ord('9') + 1)
+    other = [b for b in list(range(33, 127)) + [9, 10, 13] if b not in lower and b not in upper and b not in digits]
+    probability = [0.0] * 256
+    probability[32] = 0.16 # space
+    for values, share in ((lower, 0.60), (upper, 0.08), (digits, 0.04), (other, 0.12)):
+        for b in values:
+            probability[b] = share / len(values)
+    return [math.log2(p * 256) if p else None for p in probability] # None marks bytes that never occur in text
+
+TEXT_EVIDENCE = _text_evidence()
+
+class ConfigProbe:
+    def __init__(self, workers=None):
+        self._workers = workers
+
+    @staticmethod
+    def candidates(): # algorithm settings tried on every image, in order of preference on equal scores
+        candidates = [{'algorithm': 'X Significant Bit', 'bit_position': position} for position in range(8)]
+        candidates += [{'algorithm': 'X Significant Bit', 'bit_position': 0, 'bits_per_channel': bits}
+                       for bits in SignificantBit.PACKED_BITS]
+        candidates.append({'algorithm': 'Pixel Value Differencing'})
+        return candidates
+
+    @staticmethod
+    def _load(image):
+        if isinstance(image, str):
+            return load_pixels(image)
+        if isinstance(image, np.ndarray):
+            return image
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return np.asarray(image)
+
+    @staticmethod
+    def _read(pixels, candidate, count):
+        if candidate.get('bits_per_channel'):
+            return SignificantBit.read_packed(pixels, count, candidate['bits_per_channel'])
+        if candidate['algorithm'] == 'X Significant Bit':
+            return SignificantBit.read_bytes(pixels, count, bit_position=candidate['bit_position'])
+        return PVDAlgorithm.read_bytes(pixels, count)
+
+    @staticmethod
+    def _text_score(data): # summed evidence of the leading run of text bytes and its length
+        score = 0.0
+        previous = None
+        for index, byte in enumerate(data):
+            evidence = TEXT_EVIDENCE[byte]
+            if evidence is None:
+                return score, index
+            score += min(evidence, 0.0) if byte == previous else evidence # flat image areas repeat one byte value
+            previous = byte
+        return score, len(data)
+
+    @staticmethod
+    def score(pixels, candidate): # plausibility of one candidate from the first PROBE_BYTES bytes it would read
+        result = {'config': candidate, 'score': 0.0, 'header': False, 'encryption': None, 'compression': None, 'length': None}
+        try:
+            raw = ConfigProbe._read(pixels, candidate, PROBE_BYTES)
+        except ImageTooSmall: # image too small for this layout
+            return result
+        header = PayloadHeader.parse(raw) # a header of a newer version raises, it is not a miss
+        header_algorithm = 'X Significant Bit Packed' if candidate.get('bits_per_channel') else candidate['algorithm']
+        if header is not None and header['algorithm'] == PayloadHeader.ALGORITHMS[header_algorithm]:
+            try:
+                result['encryption'] = PayloadHeader.encryption_name(header['flags'])
+                result['compression'] = PayloadHeader.compression_name(header['flags'])
+            except ValueError:
+                return result
+            result.update(score=HEADER_SCORE, header=True, length=header['length'])
+            return result
+        if candidate.get('bits_per_channel'):
+            return result # packed payloads always start with a header
+        if candidate['algorithm'] == 'X Significant Bit': # legacy flagged layout, stops at the first cleared flag
+            data = SignificantBit.extract_bytes(pixels, candidate['bit_position'], limit=PROBE_BYTES)
+            score, _ = ConfigProbe._text_score(data) # continue flags are not counted, bright channels keep them set by chance
+        else: # legacy pvd, text followed by the end marker
+            score, _ = ConfigProbe._text_score(raw)
+            if PVDAlgorithm.END_MARKER in raw:
+                score += 32
+        result['score'] = max(0.0, score)
+        return result
+
+    def run(self, image): # image path, PIL image or rgb pixel array, returns one result per candidate, best first
+        pixels = ConfigProbe._load(image)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._workers) as executor:
+            results = list(executor.map(lambda candidate: ConfigProbe.score(pixels, candidate), ConfigProbe.candidates()))
+        results.sort(key=lambda result: result['score'], reverse=True) # stable, ties keep the candidate order
+        return results
+
+    @staticmethod
+    def resolve_config(result, base_config=None): # complete config for a probe result, keys and noise come from base_config
+        config = dict(base_config) if base_config else {'encryption': 'None', 'noise_level': 0}
+        for key in ('bit_position', 'bits_per_channel', 'scatter_key'): # probed layouts are always in scan order
+            config.pop(key, None)
+        config.update(result['config'])
+        encryption = result['encryption']
+        if encryption is not None: # recorded in the header, overrides the base config
+            config['encryption'] = 'AES' if encryption.startswith('AES') else encryption
+            if config['encryption'] == 'AES':
+                config['aes_mode'] = 'CTR' if encryption == 'AES-CTR' else 'CBC'
+        if result.get('compression') is not None: # informational, extraction always follows the header
+            config['compression'] = result['compression']
+        return config
+
+    def extract(self, image_path, base_config=None, progress=None): # probe, then fully decode the winner, returns (bytes, config)
+        from steganography import Steganography
+        if progress is not None:
+            progress(0.0, "Probing")
+        pixels = ConfigProbe._load(image_path)
+        best = self.run(pixels)[0]
+        if best['score'] < MIN_SCORE:
+            raise ValueError("No embedded data detected with any known configuration")
+        config = ConfigProbe.resolve_config(best, base_config)
+        return Steganography(config).extract_bytes(image_path, progress, pixels), config # the winner decodes the probed pixels
@@ -1,101 +1,400 @@
+import os
 import json
 import base64
 import logging
+import numpy as np
 from PIL import Image
 from meth.xsb import SignificantBit
 from meth.pvd import PVDAlgorithm
-from enc.aes import AESAlgorithm
+from meth.header import PayloadHeader, ImageTooSmall
+from meth.tiled import TiledEmbedder
+from meth.scatter import PixelScatter
 from enc.noise import Noise
+from enc.compression import Compression
+from cache import load_pixels
+from instrumentation import stage
 
-logging.basicConfig(filename='steganography.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s') # basic action logging config
+logger = logging.getLogger(__name__) # handlers are set up by the entry point, see instrumentation.configure_logging
+
+class OperationCancelled(Exception): # raised by a progress callback to abort an operation at its next checkpoint
+    pass
 
 class Steganography:
     def __init__(self, config):
         self._config = config  
         self._aes = None  
         self._iv = None
+        self._aes_mode = None
+        self._bits_per_channel = None
+        self._scatter_key = config.get('scatter_key') or None # keyed pixel order instead of scan order, see meth/scatter.py
+        self._compression = Compression.check_codec(config.get('compression', 'None')) # older configs do not compress
+        self._decompression_limit = config.get('decompression_limit') # None uses Compression.LIMIT
         self._initialize_encryption()
-        logging.info(f"Initialised Steganography with config: {self._config}")
+        self._initialize_packing()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Initialised Steganography with config: %s", self.redacted_config(self._config))
 
     def _initialize_encryption(self):
         if self._config['encryption'] == 'AES':
+            from enc.aes import AESAlgorithm # only aes configs pay for the table setup
             if 'key' in self._config and 'iv' in self._config: # encode key and iv if they exist
                 self._aes = AESAlgorithm(self._config['key'].encode())
                 self._iv = self._config['iv'].encode()
+                self._aes_mode = self._config.get('aes_mode', 'CBC')
+                if self._aes_mode not in AESAlgorithm.MODES:
+                    raise ValueError(f"Unsupported AES mode: {self._aes_mode}")
             else:
                 raise KeyError("AES encryption selected but no key or IV provided in the configuration.")
 
+    def _initialize_packing(self): # optional packed xsb mode, k low bits per channel value instead of one flagged bit plane
+        if self._config['algorithm'] == 'X Significant Bit' and self._config.get('bits_per_channel') is not None:
+            self._bits_per_channel = SignificantBit._check_packed_bits(self._config['bits_per_channel'])
+
     @staticmethod
     def load_config(file_path): # utility function to load config from file
         with open(file_path, 'r') as file:
             config = json.load(file)
-        logging.info(f"Loaded config from: {file_path}")
+        logger.info("Loaded config from: %s", file_path)
         return config
 
-    def embed_text(self, image_path, text):
-        logging.info(f"Embedding text into image: {image_path}")
-        image = Image.open(image_path)
-        if image.mode != 'RGB': # convert to RGB if not already
+    @staticmethod
+    def redacted_config(config): # config safe to log or print, secrets replaced
+        return {key: '<redacted>' if key in ('key', 'iv', 'scatter_key') else value for key, value in config.items()}
+
+    # progress is an optional callable(fraction, stage) invoked between stages, it may raise OperationCancelled to abort
+
+    def embed_text(self, image_path, text, progress=None):
+        return self.embed_bytes(image_path, text.encode(), progress)
+
+    def embed_bytes(self, image_path, data, progress=None): # data is any bytes-like object (bytes, bytearray, memoryview)
+        return Image.fromarray(self.embed_bytes_array(image_path, data, progress))
+
+    def embed_text_array(self, image_path, text, progress=None):
+        return self.embed_bytes_array(image_path, text.encode(), progress)
+
+    def embed_bytes_array(self, image_path, data, progress=None): # stego image as a (height, width, 3) uint8 array, for previews without a PIL copy
+        logger.info("Embedding %d bytes into image: %s", len(data), image_path)
+        self._report(progress, 0.0, "Loading image")
+        image = load_pixels(image_path) # decoded rgb cover, reused while the file is unchanged
+        self._report(progress, 0.2, "Encrypting")
+        data, compression = self._apply_compression(data) # before encryption, ciphertext does not compress
+        data = self._apply_encryption(data) # encrypt data if encryption is enabled
+        logger.info("Encrypted data length: %d", len(data))
+        flags = PayloadHeader.encryption_flags(self._encryption_name()) | PayloadHeader.compression_flags(compression)
+        payload = PayloadHeader.frame(self._header_algorithm(), data, flags) # length-prefixed header instead of an end marker
+        self._report(progress, 0.4, "Embedding")
+        if self._scatter_key:
+            protected_pixels = 0
+            indices, group = self._scatter_positions(image, len(payload))
+            virtual = self._apply_algorithm(PixelScatter.gather(image, indices, group), payload) # embeds into the selected pixels only
+            pixels = PixelScatter.scatter(image, indices, np.asarray(virtual)) # a fresh copy, noise goes straight into it
+            protected_indices = (indices[:, None] + np.arange(group)).reshape(-1) # every selected pixel, noise must leave them alone
+        else:
+            protected_pixels = self._footprint(image, len(payload)) # measured on the cover, before embedding
+            protected_indices = None
+            pixels = np.array(self._apply_algorithm(image, payload)) # writable, the algorithm may hand back the cached cover
+        self._report(progress, 0.8, "Adding noise")
+        with stage('noise', pixels=self._pixel_count(pixels)):
+            Noise.add_noise_array(pixels, self._config['noise_level'], protected_pixels, seed=self._config.get('noise_seed'),
+                                  protected_indices=protected_indices) # add noise
+        self._report(progress, 1.0, "Done")
+        return pixels
+
+    def embed_file(self, image_path, file_path, progress=None): # hides the raw contents of any file
+        return self.embed_bytes(image_path, self._read_file(file_path), progress)
+
+    def embed_text_tiled(self, image_path, text, output_path, tile_rows=None, progress=None):
+        return self.embed_bytes_tiled(image_path, text.encode(), output_path, tile_rows, progress)
+
+    def embed_file_tiled(self, image_path, file_path, output_path, tile_rows=None, progress=None):
+        return self.embed_bytes_tiled(image_path, self._read_file(file_path), output_path, tile_rows, progress)
+
+    def embed_bytes_tiled(self, image_path, data, output_path, tile_rows=None, progress=None): # streams the cover band by band, see meth/tiled.py
+        if self._scatter_key:
+            raise ValueError("Tiled embedding does not support scatter mode, a scattered payload can touch every band")
+        logger.info("Embedding %d bytes into image (tiled): %s", len(data), image_path)
+        self._report(progress, 0.0, "Encrypting")
+        data, compression = self._apply_compression(data)
+        data = self._apply_encryption(data)
+        flags = PayloadHeader.encryption_flags(self._encryption_name()) | PayloadHeader.compression_flags(compression)
+        payload = PayloadHeader.frame(self._header_algorithm(), data, flags)
+        band_progress = None
+        if progress is not None: # bands report their own share, cancelling removes the partial output file
+            band_progress = lambda fraction: progress(0.1 + 0.9 * fraction, "Embedding")
+        with stage('embed', len(payload)): # tiled embedding reads, embeds, adds noise and saves in one pass
+            output_path = TiledEmbedder.embed(image_path, output_path, payload, self._config['algorithm'],
+                                              bit_position=self._config.get('bit_position', 8), noise_level=self._config['noise_level'],
+                                              seed=self._config.get('noise_seed'), tile_rows=tile_rows,
+                                              bits_per_channel=self._bits_per_channel, progress=band_progress)
+        self._report(progress, 1.0, "Done")
+        return output_path
+
+    def capacity(self, image): # largest text (in utf-8 bytes) that fits the image with the configured algorithm and encryption
+        if isinstance(image, str):
+            image = load_pixels(image)
+        elif image.mode != 'RGB':
             image = image.convert('RGB')
-        data = self._apply_encryption(text.encode()) # encode text if encryption is enabled
-        logging.info(f"Encrypted data length: {len(data)}")
-        data_with_end_marker = data + b'###END###' # add end marker
-        image = self._apply_algorithm(image, data_with_end_marker)
-        image = Noise.add_noise(image, self._config['noise_level'], len(data_with_end_marker)) # add noise
-        return image
+        if self._bits_per_channel:
+            raw = SignificantBit.packed_capacity(image, self._bits_per_channel)
+        elif self._config['algorithm'] == 'X Significant Bit':
+            raw = SignificantBit.capacity(image)
+        elif self._config['algorithm'] == 'Pixel Value Differencing':
+            raw = PVDAlgorithm.capacity(image)
+        else:
+            raise ValueError(f"Unsupported algorithm: {self._config['algorithm']}")
+        available = raw - PayloadHeader.SIZE # the header is embedded in front of every payload
+        # compressible data can exceed this, the compressed size is only known per payload
+        if self._config['encryption'] == 'Base64':
+            available = (available // 4) * 3 # base64 turns every 3 bytes into 4
+        elif self._config['encryption'] == 'AES' and self._aes_mode == 'CTR':
+            available -= 16 # ctr adds no padding, only the 16 byte nonce
+        elif self._config['encryption'] == 'AES':
+            available = (available // 16) * 16 - 1 # cbc always adds 1-16 bytes of padding
+        return max(0, available)
+
+    def embed_batch(self, jobs, workers=None, manifest_path=None, tile_rows=None): # embed (cover, text, output) jobs across a process pool
+        from batch import BatchEmbedder
+        return BatchEmbedder(self._config, workers, tile_rows).run(jobs, manifest_path)
+
+    def save_image(self, image, save_path): # utility function to save image, a PIL image or a stego array
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        with stage('save', pixels=image.size[0] * image.size[1]):
+            image.save(save_path)
+        logger.info("Saved stego image to: %s", save_path)
+
+    def decode_text(self, image_path, progress=None):
+        return self.extract_bytes(image_path, progress).decode()
+
+    def extract_bytes(self, image_path, progress=None, pixels=None): # returns the embedded data as bytes, binary safe
+        # pixels is an already decoded array of image_path (the probe passes its own), readers only use the rgb channels
+        logger.info("Extracting data from image: %s", image_path)
+        self._report(progress, 0.0, "Loading image")
+        image = load_pixels(image_path, mode=None) if pixels is None else pixels # in the file's own mode, as embedded
+        self._report(progress, 0.2, "Extracting")
+        with stage('extract', pixels=self._pixel_count(image)) as extract:
+            header, payload = self._read_payload(lambda count: self._read_bytes(image, count))
+            extract.update(nbytes=len(payload) if payload is not None else 0)
+        if payload is not None:
+            self._report(progress, 0.7, "Decrypting")
+            decrypted_data = self._apply_decryption(payload)
+            logger.info("Decrypted data length: %d", len(decrypted_data))
+            data = self._apply_decompression(decrypted_data, header)
+            self._report(progress, 1.0, "Done")
+            return data
+        if self._bits_per_channel:
+            raise ValueError("No payload header found, packed images always carry one")
+        if self._scatter_key:
+            raise ValueError("No payload header found, scatter payloads always carry one (wrong scatter key?)")
+        logger.info("No payload header found, decoding with legacy end marker")
+        data = self._extract_legacy(image)
+        self._report(progress, 1.0, "Done")
+        return data
+
+    def probe(self, image_path, workers=None): # score every known algorithm layout on the image, best first, see probe.py
+        from probe import ConfigProbe
+        return ConfigProbe(workers).run(image_path)
+
+    def measure(self, cover, stego, tile_rows=None): # distortion metrics (mse, psnr, ssim, ...) between a cover and its stego image, see metrics.py
+        from metrics import ImageMetrics
+        return ImageMetrics(tile_rows).compare(cover, stego)
+
+    def decode_text_auto(self, image_path, workers=None, progress=None): # detects algorithm settings, returns (text, detected config)
+        from probe import ConfigProbe
+        data, config = ConfigProbe(workers).extract(image_path, self._config, progress)
+        return data.decode(), config
+
+    def extract_file(self, image_path, file_path, progress=None): # writes the embedded data to file_path, returns the number of bytes written
+        data = self.extract_bytes(image_path, progress)
+        with open(file_path, 'wb') as file:
+            file.write(data)
+        logger.info("Extracted %d bytes to: %s", len(data), file_path)
+        return len(data)
 
-    def save_image(self, image, save_path): # utility function to save image
-        image.save(save_path)
-        logging.info(f"Saved stego image to: {save_path}")
-
-    def decode_text(self, image_path):
-        logging.info(f"Decoding text from image: {image_path}")
-        image = Image.open(image_path)
-        data = self._extract_data(image)
-        if self._config['encryption'] == 'None':
-            return data.replace('###END###', '')
-        data = data.replace('###END###', '')
-        decrypted_data = self._apply_decryption(data.encode('latin1')) # decode if encryption enabled, latin1 encoding (for aes mostly)
-        logging.info(f"Decrypted data length: {len(decrypted_data)}")
-        return decrypted_data.decode()
-
-    def _extract_data(self, image):
+    def decode_text_tiled(self, image_path, tile_rows=None, progress=None):
+        return self.extract_bytes_tiled(image_path, tile_rows, progress).decode()
+
+    def extract_bytes_tiled(self, image_path, tile_rows=None, progress=None): # header-framed images only, reads just the rows holding the payload
+        if self._scatter_key:
+            raise ValueError("Tiled decoding does not support scatter mode, a scattered payload can touch every band")
+        logger.info("Extracting data from image (tiled): %s", image_path)
+        self._report(progress, 0.0, "Extracting")
+        read = lambda count: TiledEmbedder.read_bytes(image_path, count, self._config['algorithm'],
+                                                      bit_position=self._config.get('bit_position', 8), tile_rows=tile_rows,
+                                                      bits_per_channel=self._bits_per_channel)
+        with stage('extract') as extract:
+            header, payload = self._read_payload(read)
+            extract.update(nbytes=len(payload) if payload is not None else 0)
+        if payload is None:
+            raise ValueError("No payload header found, tiled decoding does not support legacy images")
+        self._report(progress, 0.7, "Decrypting")
+        data = self._apply_decompression(self._apply_decryption(payload), header)
+        self._report(progress, 1.0, "Done")
+        return data
+
+    @staticmethod
+    def _report(progress, fraction, name):
+        if progress is not None:
+            progress(fraction, name)
+
+    @staticmethod
+    def _pixel_count(image):
+        width, height = SignificantBit._dimensions(image)
+        return width * height
+
+    @staticmethod
+    def _read_file(file_path): # whole file in one preallocated buffer, returned as a memoryview
+        size = os.path.getsize(file_path)
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        read = 0
+        with open(file_path, 'rb') as file:
+            while read < size:
+                count = file.readinto(view[read:])
+                if not count:
+                    break
+                read += count
+        return view[:read]
+
+    def _extract_legacy(self, image): # images embedded before the payload header, terminated by '###END###'
+        with stage('extract', pixels=self._pixel_count(image)) as extract:
+            data = self._extract_data(image).replace(b'###END###', b'')
+            extract.update(nbytes=len(data))
+        decrypted_data = self._apply_decryption(data) # decode if encryption enabled
+        logger.info("Decrypted data length: %d", len(decrypted_data))
+        return decrypted_data
+
+    def _read_payload(self, read): # read(count) returns the first count embedded bytes, gives (header, payload) or (None, None) for legacy images
+        try:
+            raw = read(PayloadHeader.SIZE)
+        except ImageTooSmall: # image too small to even hold a header
+            return None, None
+        header = PayloadHeader.parse(raw) # a header from a newer format version raises instead of falling back to legacy
+        if header is None:
+            return None, None
+        if header['algorithm'] != PayloadHeader.ALGORITHMS.get(self._header_algorithm()):
+            raise ValueError("Image was embedded with a different algorithm than the configured one")
+        encryption = PayloadHeader.encryption_name(header['flags'])
+        if encryption != self._encryption_name():
+            raise ValueError(f"Image was embedded with {encryption} encryption, config uses {self._encryption_name()}")
+        payload = memoryview(read(PayloadHeader.SIZE + header['length']))[PayloadHeader.SIZE:]
+        PayloadHeader.verify(header, payload)
+        return header, payload
+
+    def _header_algorithm(self): # algorithm as recorded in the payload header
+        if self._bits_per_channel:
+            return 'X Significant Bit Packed'
+        return self._config['algorithm']
+
+    def _encryption_name(self): # encryption as recorded in the payload header
+        if self._config['encryption'] == 'AES' and self._aes_mode == 'CTR':
+            return 'AES-CTR'
+        return self._config['encryption']
+
+    def _read_bytes(self, image, count):
+        if self._scatter_key: # read from the gathered pixels, in the order they were embedded
+            pixels = np.asarray(image)
+            image = PixelScatter.gather(pixels, *self._scatter_positions(pixels, count))
+        if self._bits_per_channel:
+            return SignificantBit.read_packed(image, count, self._bits_per_channel)
+        if self._config['algorithm'] == 'X Significant Bit':
+            return SignificantBit.read_bytes(image, count, bit_position=self._config.get('bit_position', 8))
+        elif self._config['algorithm'] == 'Pixel Value Differencing':
+            return PVDAlgorithm.read_bytes(image, count)
+        else:
+            raise ValueError(f"Unsupported algorithm: {self._config['algorithm']}")
+
+    def _extract_data(self, image): # legacy flag or marker terminated data as bytes
         if self._config['algorithm'] == 'X Significant Bit':
             bit_position = self._config.get('bit_position', 8) # get bit position if it exists
-            return SignificantBit.extract(image, bit_position=bit_position) # extract with xsb
+            return SignificantBit.extract_bytes(image, bit_position=bit_position) # extract with xsb
         elif self._config['algorithm'] == 'Pixel Value Differencing':
-            return PVDAlgorithm.extract(image) # extract with pvd
+            return PVDAlgorithm.extract_bytes(image) # extract with pvd
         else:
             raise ValueError(f"Unsupported algorithm: {self._config['algorithm']}")
 
+    def _footprint(self, image, data_length): # leading pixels the algorithm modifies, noise must leave them alone
+        if self._bits_per_channel:
+            return SignificantBit.packed_footprint(data_length, self._bits_per_channel)
+        if self._config['algorithm'] == 'X Significant Bit':
+            return SignificantBit.footprint(data_length)
+        if self._config['algorithm'] == 'Pixel Value Differencing':
+            return PVDAlgorithm.footprint(image, data_length)
+        return 0
+
+    def _scatter_positions(self, pixels, data_length): # (flat indices, pixels per index) holding the first data_length bytes
+        # the first n positions of the order never depend on n, so a reader can ask for just the header and later the rest
+        if self._config['algorithm'] == 'Pixel Value Differencing':
+            count = min(PixelScatter.pair_count(pixels), -(-data_length * 8 // 9)) # every pair carries at least 9 bits over rgb
+            return PixelScatter.pair_order(self._scatter_key, pixels, count), 2
+        return PixelScatter.pixel_order(self._scatter_key, pixels, self._footprint(None, data_length)), 1
+
     def _apply_algorithm(self, image, data):
-        logging.info(f"Applying algorithm: {self._config['algorithm']}")
+        logger.info("Applying algorithm: %s", self._config['algorithm'])
+        with stage('embed', len(data), self._pixel_count(image)):
+            return self._embed_payload(image, data)
+
+    def _embed_payload(self, image, data):
+        if self._bits_per_channel:
+            return SignificantBit.embed_packed(image, data, self._bits_per_channel) # k bits per channel, framed by the header
         if self._config['algorithm'] == 'X Significant Bit':
             bit_position = self._config.get('bit_position', 8) # get bit position if it exists
-            return SignificantBit.embed(image, data, bit_position=bit_position) # embed with xsb
+            return SignificantBit.embed(image, data, bit_position=bit_position, backend=self._config.get('backend')) # embed with xsb
         if self._config['algorithm'] == 'Pixel Value Differencing':
-            return PVDAlgorithm.embed(image, data) # embed with pvd
+            return PVDAlgorithm.embed(image, data, backend=self._config.get('backend'), end_marker=False) # embed with pvd, framed by the header
         return image
 
     def _apply_encryption(self, data):
-        logging.info(f"Applying encryption: {self._config['encryption']}")
+        logger.info("Applying encryption: %s", self._config['encryption'])
+        with stage('encrypt', len(data)):
+            return self._encrypt(data)
+
+    def _encrypt(self, data):
         if self._config['encryption'] == 'Base64':
             return base64.b64encode(data) # encrypt data with base64
         elif self._config['encryption'] == 'AES':
+            if self._aes_mode == 'CTR': # fresh random counter block per payload, stored in front of the ciphertext
+                nonce = os.urandom(16) # a shared config iv would reuse one keystream across every image
+                return nonce + self._aes.encrypt_ctr_mode(data, nonce) # encrypt data with aes in counter mode
             return self._aes.encrypt_cbc_mode(data, self._iv) # encrypt data with aes
         elif self._config['encryption'] == 'None':
             return data # return as is
         return data
     
+    def _apply_compression(self, data): # returns (data, codec used), the configured codec is skipped when it does not help
+        with stage('compress', len(data)) as compress:
+            compression, data = Compression.compress(data, self._compression)
+            compress.update(nbytes=len(data))
+        if compression != self._compression:
+            logger.info("Compression with %s did not shrink the payload, embedding it uncompressed", self._compression)
+        elif compression != 'None':
+            logger.info("Compressed payload with %s to %d bytes", compression, len(data))
+        return data, compression
+
+    def _apply_decompression(self, data, header): # codec comes from the header, not the config
+        compression = PayloadHeader.compression_name(header['flags'])
+        if compression == 'None':
+            return data
+        with stage('decompress', len(data)):
+            return Compression.decompress(data, compression, self._decompression_limit)
+
     def _apply_decryption(self, data):
-        logging.info(f"Applying decryption: {self._config['encryption']}")
+        logger.info("Applying decryption: %s", self._config['encryption'])
+        with stage('decrypt', len(data)):
+            return self._decrypt(data)
+
+    def _decrypt(self, data):
         if self._config['encryption'] == 'Base64':
             missing_padding = len(data) % 4 # base64 requires data length to be multiple of 4
             if missing_padding:
-                data += b'=' * (4 - missing_padding) # pads with '=' to meet requirement
+                data = bytes(data) + b'=' * (4 - missing_padding) # pads with '=' to meet requirement
             return base64.b64decode(data)
         elif self._config['encryption'] == 'AES':
+            if self._aes_mode == 'CTR':
+                if len(data) < 16:
+                    raise ValueError("Ciphertext is empty or truncated") # every ctr payload starts with its nonce
+                return self._aes.decrypt_ctr_mode(data[16:], bytes(data[:16])) # decrypt with aes in counter mode
             return self._aes.decrypt_cbc_mode(data, self._iv) # decrypt with aes
         elif self._config['encryption'] == 'None':
-            return data # return as is
-        return data
\ No newline at end of file
+            return bytes(data) # return as is, payloads may arrive as a memoryview
+        return bytes(data)
\ No newline at end of file
@@ -0,0 +1,26 @@
+import numpy as np
+from PIL import Image
+from steganography import Steganography
+
+CTR_CONFIG = {'algorithm': 'X Significant Bit', 'encryption': 'AES', 'aes_mode': 'CTR', 'noise_level': 0, 'bit_position': 0,
+              'key': '0123456789abcdef', 'iv': 'abcdef9876543210'}
+
+def test_ctr_encrypts_the_same_plaintext_differently():
+    steganography = Steganography(CTR_CONFIG)
+    plaintext = b'the same payload embedded twice'
+    first = steganography._encrypt(plaintext)
+    second = steganography._encrypt(plaintext)
+    assert first != second
+    assert first[16:] != second[16:] # a different keystream, not only a different nonce
+    assert steganography._decrypt(first) == plaintext
+    assert steganography._decrypt(second) == plaintext
+
+def test_ctr_images_from_one_config_both_decode(tmp_path):
+    cover = tmp_path / 'cover.png'
+    Image.fromarray(np.random.default_rng(0).integers(0, 256, (40, 50, 3), dtype=np.uint8)).save(cover)
+    steganography = Steganography(CTR_CONFIG)
+    for name in ('first.png', 'second.png'):
+        steganography.save_image(steganography.embed_text(str(cover), 'batch payload'), tmp_path / name)
+    assert not np.array_equal(np.asarray(Image.open(tmp_path / 'first.png')), np.asarray(Image.open(tmp_path / 'second.png')))
+    for name in ('first.png', 'second.png'):
+        assert Steganography(CTR_CONFIG).decode_text(str(tmp_path / name)) == 'batch payload'
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from PIL import Image
+from meth.header import PayloadHeader
+from meth.xsb import SignificantBit
+from steganography import Steganography
+
+CONFIG = {'algorithm': 'X Significant Bit', 'encryption': 'None', 'noise_level': 0, 'bit_position': 0}
+
+def _cover(path, height=40, width=50):
+    Image.fromarray(np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)).save(path)
+    return str(path)
+
+def test_newer_header_version_is_an_error(tmp_path):
+    framed = PayloadHeader.frame(CONFIG['algorithm'], b'written by a newer release')
+    framed[4] = PayloadHeader.VERSION + 1 # version byte follows the 4 byte magic
+    stego = SignificantBit.embed(np.asarray(Image.open(_cover(tmp_path / 'cover.png'))), framed, bit_position=0)
+    stego.save(tmp_path / 'stego.png')
+    with pytest.raises(ValueError, match="Unsupported payload header version"):
+        Steganography(CONFIG).extract_bytes(str(tmp_path / 'stego.png'))
+
+def test_image_too_small_for_a_header_falls_back_to_legacy(tmp_path):
+    cover = _cover(tmp_path / 'tiny.png', 2, 2) # 4 pixels, a header needs 45
+    assert isinstance(Steganography(CONFIG).extract_bytes(cover), (bytes, bytearray)) # legacy decoding, no header error
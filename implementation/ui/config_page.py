@@ -3,6 +3,7 @@ from PyQt6.QtCore import Qt
 import json
 import pyperclip
 import os
+from .validation import validate_config
 
 class ConfigPage(QWidget):
     def __init__(self):
@@ -54,6 +55,17 @@ class ConfigPage(QWidget):
         self.aes_iv_input.textChanged.connect(self._update_json_display)
         self.options_layout.addWidget(self.aes_iv_input)
 
+        self.aes_mode_label = QLabel("AES Mode:")
+        self.aes_mode_label.setVisible(False) # set visibility to false
+        self.options_layout.addWidget(self.aes_mode_label)
+
+        self.aes_mode_dropdown = QComboBox()
+        self.aes_mode_dropdown.addItems(["CBC", "CTR"])
+        self.aes_mode_dropdown.setVisible(False)
+        self.aes_mode_dropdown.setToolTip("CBC pads to 16 byte blocks, CTR adds a 16 byte nonce instead of padding and suits large payloads.")
+        self.aes_mode_dropdown.currentTextChanged.connect(self._update_json_display)
+        self.options_layout.addWidget(self.aes_mode_dropdown)
+
         self.bit_position_label = QLabel("Bit Position:")
         self.bit_position_label.setVisible(False) # set visibility to false
         self.options_layout.addWidget(self.bit_position_label)
@@ -81,9 +93,37 @@ class ConfigPage(QWidget):
 
         self.options_layout.addLayout(bit_position_labels_layout)
 
+        self.bits_per_channel_label = QLabel("Packed Bits Per Channel:")
+        self.bits_per_channel_label.setVisible(False)
+        self.options_layout.addWidget(self.bits_per_channel_label)
+
+        self.bits_per_channel_dropdown = QComboBox()
+        self.bits_per_channel_dropdown.addItems(["Off", "1", "2", "3", "4"])
+        self.bits_per_channel_dropdown.setVisible(False)
+        self.bits_per_channel_dropdown.setToolTip("Pack 1-4 low bits into every channel instead of one flagged bit plane (ignores bit position).")
+        self.bits_per_channel_dropdown.currentTextChanged.connect(self._update_json_display)
+        self.options_layout.addWidget(self.bits_per_channel_dropdown)
+
         self.algorithm_dropdown.setCurrentText("X Significant Bit")
         self._toggle_bit_position_fields("X Significant Bit")
 
+        self.compression_label = QLabel("Compression:")
+        self.options_layout.addWidget(self.compression_label)
+
+        self.compression_dropdown = QComboBox()
+        self.compression_dropdown.addItems(["None", "zlib", "lzma", "bz2"])
+        self.compression_dropdown.setToolTip("Compress the data before encryption, skipped automatically when it would not get smaller.")
+        self.compression_dropdown.currentTextChanged.connect(self._update_json_display)
+        self.options_layout.addWidget(self.compression_dropdown)
+
+        self.scatter_key_label = QLabel("Scatter Key (optional):")
+        self.options_layout.addWidget(self.scatter_key_label)
+
+        self.scatter_key_input = QLineEdit()
+        self.scatter_key_input.setToolTip("Spread the data over key-chosen pixels instead of the top rows. Needed again to decode.")
+        self.scatter_key_input.textChanged.connect(self._update_json_display)
+        self.options_layout.addWidget(self.scatter_key_input)
+
         self.noise_level_label = QLabel("Noise Level:")
         self.options_layout.addWidget(self.noise_level_label)
 
@@ -130,6 +170,8 @@ class ConfigPage(QWidget):
         self.aes_key_input.setVisible(is_aes)
         self.aes_iv_label.setVisible(is_aes)
         self.aes_iv_input.setVisible(is_aes)
+        self.aes_mode_label.setVisible(is_aes)
+        self.aes_mode_dropdown.setVisible(is_aes)
 
     def _toggle_bit_position_fields(self, algorithm_type):
         is_xsb = algorithm_type == "X Significant Bit"
@@ -137,6 +179,8 @@ class ConfigPage(QWidget):
         self.bit_position_slider.setVisible(is_xsb)
         self.least_significant_label.setVisible(is_xsb)
         self.most_significant_label.setVisible(is_xsb)
+        self.bits_per_channel_label.setVisible(is_xsb)
+        self.bits_per_channel_dropdown.setVisible(is_xsb)
 
     def _update_noise_level_label(self, value):
         self.noise_level_value_label.setText(f"{value / 10:.1f}") # set noise level value label
@@ -151,8 +195,15 @@ class ConfigPage(QWidget):
         if self.encryption_dropdown.currentText() == "AES": # addd key and iv if AES
             config["key"] = self.aes_key_input.text()
             config["iv"] = self.aes_iv_input.text()
+            config["aes_mode"] = self.aes_mode_dropdown.currentText()
         if self.algorithm_dropdown.currentText() == "X Significant Bit": # add bit position if XSB
             config["bit_position"] = self.bit_position_slider.value()
+            if self.bits_per_channel_dropdown.currentText() != "Off": # packed mode
+                config["bits_per_channel"] = int(self.bits_per_channel_dropdown.currentText())
+        if self.compression_dropdown.currentText() != "None":
+            config["compression"] = self.compression_dropdown.currentText()
+        if self.scatter_key_input.text(): # scatter mode only when a key is given
+            config["scatter_key"] = self.scatter_key_input.text()
         self.json_display.setText(json.dumps(config, indent=4))
 
     def _pad_string(self, text, target_length=16):
@@ -218,43 +269,28 @@ class ConfigPage(QWidget):
             if file_path:
                 with open(file_path, 'r') as file:
                     config = json.load(file)
-                    if self._validate_config(config): # validate config
+                    if validate_config(config): # validate config
                         self.algorithm_dropdown.setCurrentText(config.get("algorithm", "Pixel Value Differencing")) # set values
                         self.encryption_dropdown.setCurrentText(config.get("encryption", "None"))
                         self.noise_level_slider.setValue(int(config.get("noise_level", 1.0) * 10))
                         if config.get("encryption") == "AES":
                             self.aes_key_input.setText(config.get("key", "")) # set key and iv
                             self.aes_iv_input.setText(config.get("iv", ""))
+                            self.aes_mode_dropdown.setCurrentText(config.get("aes_mode", "CBC")) # older configs have no mode, default to cbc
                         else:
                             self.aes_key_input.clear() # clear key and iv
                             self.aes_iv_input.clear()
                         if config.get("algorithm") == "X Significant Bit":
                             self.bit_position_slider.setValue(config.get("bit_position", 8)) # set bit position
+                            self.bits_per_channel_dropdown.setCurrentText(str(config.get("bits_per_channel", "Off"))) # older configs are not packed
+                        self.scatter_key_input.setText(config.get("scatter_key", "")) # empty for sequential configs
+                        self.compression_dropdown.setCurrentText(config.get("compression", "None")) # older configs do not compress
                         self._update_json_display() # update json display with loaded config
                     else:
                         self._show_error_message("Invalid configuration file.")
         except Exception as e:
             self._show_error_message(f"Error loading config: {e}.\nMake sure the file is a valid JSON file.")
 
-    def _validate_config(self, config):
-        # config requirements
-        required_keys = ["algorithm", "encryption", "noise_level"]
-        valid_algorithms = ["X Significant Bit", "Pixel Value Differencing"]
-        valid_encryptions = ["None", "Base64", "AES"]
-        
-        for key in required_keys:
-            if key not in config:
-                return False
-        if config["algorithm"] not in valid_algorithms:
-            return False
-        if config["encryption"] not in valid_encryptions:
-            return False
-        if config["encryption"] == "AES" and ("key" not in config or "iv" not in config):
-            return False
-        if config["algorithm"] == "X Significant Bit" and "bit_position" not in config:
-            return False
-        return True # all config checks passed
-
     def _copy_json_to_clipboard(self):
         pyperclip.copy(self.json_display.toPlainText()) # copy json to clipboard
 
@@ -1,13 +1,13 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QProgressBar, QFileDialog, QCheckBox, QSpinBox
-from PIL import Image
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QProgressBar, QFileDialog, QCheckBox, QSpinBox, QHBoxLayout
 import os
-from data_structures.linkedlist import LinkedList
+from .workers import JobQueue
 
 class ConversionPage(QWidget):
     def __init__(self):
         super().__init__()
+        self._jobs = JobQueue(self) # each convert click is one job on the shared thread pool
+        self._jobs.changed.connect(self._update_job_status)
         self._init_ui()
-        self._task_list = LinkedList()
 
     def _init_ui(self):
         layout = QVBoxLayout(self)
@@ -97,8 +97,16 @@ class ConversionPage(QWidget):
         self._convert_button.clicked.connect(self._convert_images)
         layout.addWidget(self._convert_button)
         
+        progress_layout = QHBoxLayout()
         self._progress_bar = QProgressBar()  # conversion progress bar
-        layout.addWidget(self._progress_bar)
+        progress_layout.addWidget(self._progress_bar)
+
+        self._cancel_button = QPushButton("Cancel")
+        self._cancel_button.setToolTip("Cancel all running and queued conversions.")
+        self._cancel_button.setEnabled(False)
+        self._cancel_button.clicked.connect(self._jobs.cancel_all)
+        progress_layout.addWidget(self._cancel_button)
+        layout.addLayout(progress_layout)
         
         self._status_label = QLabel("Status: Ready")
         layout.addWidget(self._status_label)
@@ -154,28 +162,32 @@ class ConversionPage(QWidget):
         maintain_aspect_ratio = self._maintain_aspect_ratio_checkbox.isChecked()
         width = self._resize_width_spinbox.value()
         height = self._resize_height_spinbox.value()
-        total_files = len(file_paths) # total number of files to convert
         
-        # Add tasks to the linked list
-        for file_path in file_paths:
-            self._task_list.append((file_path, output_format, output_dir, quality, overwrite, resize, maintain_aspect_ratio, width, height))
+        from conversion import ImageConverter # deferred so the tab opens without loading PIL
+        resize_to = (width, height) if resize else None
+        converter = ImageConverter(output_format, quality, resize_to, maintain_aspect_ratio, overwrite) # settings are captured now, the ui stays editable
 
-        # Process tasks from the linked list
-        while not self._task_list.is_empty():
-            task = self._task_list.pop()
-            try:
-                self._process_image(*task)
-            except Exception as e:
-                self._status_label.setText(f"Error converting {task[0]}: {e}")
-                return
+        worker = self._jobs.submit(converter.run, file_paths, output_dir) # the whole selection is one job, converted on its own pool
+        worker.signals.progress.connect(self._show_progress)
+        worker.signals.finished.connect(self._show_results)
+        worker.signals.error.connect(self._status_label.setText)
+        worker.signals.cancelled.connect(lambda: self._status_label.setText("Conversion cancelled"))
 
-            self._progress_bar.setValue(int((total_files - self._task_list_length()) / total_files * 100)) # update progress bar
-            self._status_label.setText(f"Converting {total_files - self._task_list_length()}/{total_files} images...") # update status label
+    def _show_progress(self, percent, stage):
+        self._progress_bar.setValue(percent) # update progress bar
+        self._status_label.setText(stage) # update status label
 
-        self._status_label.setText("Conversion complete!")
+    def _show_results(self, results):
+        failures = [result for result in results if result['status'] != 'ok']
+        if not failures:
+            self._status_label.setText("Conversion complete!")
+            return
+        first = failures[0]
+        self._status_label.setText(f"Converted {len(results) - len(failures)}/{len(results)} images, "
+                                   f"{len(failures)} failed (first: {os.path.basename(first['input'])}: {first['error']})")
 
-    def _task_list_length(self):
-        return self._task_list.length()
+    def _update_job_status(self, pending):
+        self._cancel_button.setEnabled(pending > 0)
 
     def _get_file_paths(self):
         path = self._convert_path.text()
@@ -199,42 +211,6 @@ class ConversionPage(QWidget):
                     raise FileNotFoundError(f"The file does not exist: '{file_path}'")
             return file_paths
 
-    def _process_image(self, file_path, output_format, output_dir, quality, overwrite, resize, maintain_aspect_ratio, width, height):
-        img = Image.open(file_path)
-        if resize:
-            img = self._resize_image(img, maintain_aspect_ratio, width, height) # resize image
-        if output_format == ".jpg" and img.mode == "RGBA": # convert RGBA to RGB for .jpg format
-            img = img.convert("RGB") # convert img to RGB mode
-        output_path = self._get_output_path(file_path, output_format, output_dir, overwrite)
-        try:
-            with open(output_path, 'wb') as f:  # ensure the file can be opened for writing
-                if output_format == ".jpg":
-                    img.save(f, format="JPEG", quality=quality) # save with specified quality for JPEG
-                else:
-                    img.save(f, format=output_format[1:].upper()) # save without quality for other formats
-        except Exception as e:
-            self._status_label.setText(f"Error saving {output_path}: {e}")
-            raise
-
-    def _resize_image(self, img, maintain_aspect_ratio, width, height):
-        if maintain_aspect_ratio:
-            img.thumbnail((width, height)) # resize  while maintaining aspect ratio
-        else:
-            img = img.resize((width, height)) # resize without maintaining aspect ratio
-        return img
-
-    def _get_output_path(self, file_path, output_format, output_dir, overwrite):
-        output_path = os.path.join(output_dir, os.path.basename(file_path).rsplit('.', 1)[0] + output_format) # create output path
-        if not output_path:
-            raise ValueError("Output directory is invalid")
-        if not overwrite and os.path.exists(output_path):
-            base, ext = os.path.splitext(output_path) # split path into base and extension
-            counter = 1
-            while os.path.exists(output_path):
-                output_path = f"{base}_{counter}{ext}" # add counter to filename if file already exists
-                counter += 1
-        return output_path
-
     def _merge_sort(self, file_paths):
         if len(file_paths) <= 1:
             return file_paths
@@ -245,10 +221,14 @@ class ConversionPage(QWidget):
 
     def _merge(self, left, right):
         sorted_list = []
-        while left and right:
-            if left[0] <= right[0]: # compare first elements of left and right lists
-                sorted_list.append(left.pop(0)) # remove first element from left list and append to sorted list
+        i = j = 0 # read positions, popping from the front of a list is linear and made large merges quadratic
+        while i < len(left) and j < len(right):
+            if left[i] <= right[j]: # compare first remaining elements of left and right lists
+                sorted_list.append(left[i])
+                i += 1
             else:
-                sorted_list.append(right.pop(0))
-        sorted_list.extend(left or right) # extend sorted list with remaining elements from left or right list
+                sorted_list.append(right[j])
+                j += 1
+        sorted_list.extend(left[i:]) # extend sorted list with remaining elements from left or right list
+        sorted_list.extend(right[j:])
         return sorted_list
\ No newline at end of file
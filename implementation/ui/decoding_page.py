@@ -1,13 +1,16 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QGraphicsView, QGraphicsScene, QHBoxLayout, QFileDialog, QMessageBox
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QGraphicsView, QGraphicsScene, QHBoxLayout, QFileDialog, QMessageBox, QCheckBox, QProgressBar
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap, QWheelEvent, QPalette, QColor
-from steganography import Steganography
+from PyQt6.QtGui import QWheelEvent, QPalette, QColor
 import pyperclip
+from .workers import JobQueue
+from .validation import validate_config
 
 class DecodingPage(QWidget):
     def __init__(self):
         super().__init__()
         self.steganography = None
+        self._jobs = JobQueue(self) # decoding runs on pool threads, the window stays responsive
+        self._jobs.changed.connect(self._update_job_status)
         self._init_ui()
 
     def _init_ui(self):
@@ -56,12 +59,30 @@ class DecodingPage(QWidget):
         config_button_layout.addWidget(self.unload_config_button)
         
         layout.addLayout(config_button_layout)
+
+        self.auto_detect_checkbox = QCheckBox("Auto-detect algorithm settings")
+        self.auto_detect_checkbox.setToolTip("Probe every algorithm and bit position, a loaded config only supplies the AES key and IV.")
+        layout.addWidget(self.auto_detect_checkbox)
         
         self.decode_button = QPushButton("Decode")
         self.decode_button.setToolTip("Start the decoding process.")
         self.decode_button.clicked.connect(self._decode_data)
         layout.addWidget(self.decode_button)
 
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar() # progress of the most recently reported job
+        progress_layout.addWidget(self.progress_bar)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setToolTip("Cancel all running and queued jobs.")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self._jobs.cancel_all)
+        progress_layout.addWidget(self.cancel_button)
+        layout.addLayout(progress_layout)
+
+        self.job_label = QLabel("Jobs: none running")
+        layout.addWidget(self.job_label)
+
     def _init_decoded_text_output(self, layout):
         self.decoded_text_label = QLabel("Decoded Text:")
         layout.addWidget(self.decoded_text_label)
@@ -82,17 +103,27 @@ class DecodingPage(QWidget):
             file_path, _ = QFileDialog.getOpenFileName(self, "Select Image", "", "Images (*.png *.jpg *.bmp)") # get image file path
             if file_path:
                 self.image_path.setText(file_path) # set image path in input field
-                pixmap = QPixmap(file_path) # create pixmap from image
-                self.image_scene.addPixmap(pixmap) # add pixmap to scene
+                from .preview import load_cover
+                worker = self._jobs.submit(load_cover, file_path) # decoded once on a pool thread, shared with the extraction of rgb images
+                worker.signals.progress.connect(self._show_progress)
+                worker.signals.finished.connect(lambda pixels, path=file_path: self._show_image(path, pixels))
+                worker.signals.error.connect(lambda e: self._show_error_message(f"Error browsing image: {e}.\nMake sure the file is an image."))
         except Exception as e:
             self._show_error_message(f"Error browsing image: {e}.\nMake sure the file is an image.")
 
+    def _show_image(self, image_path, pixels):
+        if image_path != self.image_path.text(): # another image was chosen while this one loaded
+            return
+        from .preview import to_pixmap
+        self.image_scene.addPixmap(to_pixmap(pixels)) # add pixmap to scene
+
     def _load_config(self):
         try:
             file_path, _ = QFileDialog.getOpenFileName(self, "Select Config File", "", "JSON Files (*.json);;All Files (*)")
             if file_path:
+                from steganography import Steganography # first use pulls in numpy and PIL
                 config = Steganography.load_config(file_path) # load config from file
-                if self._validate_config(config): # validate config using _validate_config method
+                if validate_config(config): # validate config
                     self.steganography = Steganography(config)
                     self._set_status_bar_color("green") # set status bar color to green
                     self.status_label.setText("Config Status: Loaded")
@@ -105,25 +136,6 @@ class DecodingPage(QWidget):
         except Exception as e:
             self._show_error_message(f"Error loading config: {e}.\nMake sure the file is a valid JSON file.")
 
-    def _validate_config(self, config):
-        # config requirements
-        required_keys = ["algorithm", "encryption", "noise_level"]
-        valid_algorithms = ["X Significant Bit", "Pixel Value Differencing"]
-        valid_encryptions = ["None", "Base64", "AES"]
-        
-        for key in required_keys:
-            if key not in config:
-                return False
-        if config["algorithm"] not in valid_algorithms:
-            return False
-        if config["encryption"] not in valid_encryptions:
-            return False
-        if config["encryption"] == "AES" and ("key" not in config or "iv" not in config):
-            return False
-        if config["algorithm"] == "X Significant Bit" and "bit_position" not in config:
-            return False
-        return True # all config checks passed
-
     def _unload_config(self):
         self.steganography = None # set steganography object to None
         self._set_status_bar_color("red") # set status bar color to red
@@ -136,13 +148,54 @@ class DecodingPage(QWidget):
         self.status_bar.setPalette(palette)
 
     def _decode_data(self):
-        try:
-            if self.steganography:
-                image_path = self.image_path.text()
-                decoded_text = self.steganography.decode_text(image_path) # attempt to decode text
-                self.decoded_text_output.setText(decoded_text) # set decoded text in output field
-        except Exception as e:
-            self._show_error_message(f"Error decoding data: {e}.\nMake sure your config file is correct.")
+        image_path = self.image_path.text()
+        if self.auto_detect_checkbox.isChecked(): # works without a config for unencrypted and base64 images
+            worker = self._jobs.submit(self._decode_auto, self.steganography, image_path)
+        elif self.steganography:
+            worker = self._jobs.submit(self._decode_configured, self.steganography, image_path) # queued behind any running jobs
+        else:
+            return
+        worker.signals.progress.connect(self._show_progress)
+        worker.signals.finished.connect(self._show_decoded)
+        worker.signals.error.connect(lambda e: self._show_error_message(f"Error decoding data: {e}.\nMake sure your config file is correct."))
+        worker.signals.cancelled.connect(lambda: self.job_label.setText("Jobs: decoding cancelled"))
+
+    @staticmethod
+    def _decode_auto(steganography, image_path, progress=None): # runs on a pool thread, returns (text, detected config)
+        if steganography:
+            return steganography.decode_text_auto(image_path, progress=progress)
+        from probe import ConfigProbe
+        data, config = ConfigProbe().extract(image_path, progress=progress)
+        return data.decode(), config
+
+    @staticmethod
+    def _decode_configured(steganography, image_path, progress=None):
+        return steganography.decode_text(image_path, progress), None
+
+    def _show_decoded(self, result):
+        decoded_text, config = result
+        self.decoded_text_output.setText(decoded_text) # set decoded text in output field
+        if config is not None:
+            self.status_label.setText(f"Detected: {self._describe_config(config)}")
+
+    def _show_progress(self, percent, stage):
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"{stage} %p%")
+
+    def _update_job_status(self, pending):
+        self.cancel_button.setEnabled(pending > 0)
+        self.job_label.setText(f"Jobs: {pending} running or queued" if pending else "Jobs: none running")
+
+    def _describe_config(self, config):
+        details = [config["algorithm"]]
+        if config.get("bits_per_channel"):
+            details.append(f"{config['bits_per_channel']} bits per channel")
+        elif config["algorithm"] == "X Significant Bit":
+            details.append(f"bit position {config['bit_position']}")
+        details.append(f"encryption {config['encryption']}")
+        if config.get("compression", "None") != "None":
+            details.append(f"compressed with {config['compression']}")
+        return ", ".join(details)
 
     def _copy_text(self):
         decoded_text = self.decoded_text_output.text() # get decoded text
@@ -1,14 +1,20 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QGraphicsView, QGraphicsScene, QHBoxLayout, QFileDialog, QMessageBox
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QGraphicsView, QGraphicsScene, QHBoxLayout, QFileDialog, QMessageBox, QProgressBar
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap, QWheelEvent, QPalette, QColor
-from steganography import Steganography
+from PyQt6.QtGui import QWheelEvent, QPalette, QColor
+import json
+import os
 import pyperclip
-from PIL.ImageQt import ImageQt
+from .workers import JobQueue
+from .validation import validate_config
 
 class EmbeddingPage(QWidget):
     def __init__(self):
         super().__init__()
         self.steganography = None
+        self._config_json = None # canonical form of the loaded config, part of the stego result key
+        self._stego_result = None # (key, stego array) of the last embed, reused by save and the preview
+        self._jobs = JobQueue(self) # embedding runs on pool threads, the window stays responsive
+        self._jobs.changed.connect(self._update_job_status)
         self._init_ui()
 
     def _init_ui(self):
@@ -41,6 +47,9 @@ class EmbeddingPage(QWidget):
         preview_layout.addWidget(self.original_image_view) # add original image view to layout
         preview_layout.addWidget(self.stego_image_view)
         layout.addLayout(preview_layout)
+
+        self.capacity_label = QLabel("Capacity: load an image and config") # payload capacity for the current image and config
+        layout.addWidget(self.capacity_label)
         
         self.embed_text_input = QLineEdit() # text input field for embedding
         self.embed_text_input.setPlaceholderText("Enter text to embed")
@@ -86,15 +95,32 @@ class EmbeddingPage(QWidget):
         self.go_button.clicked.connect(self._embed_data)
         layout.addWidget(self.go_button)
 
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar() # progress of the most recently reported job
+        progress_layout.addWidget(self.progress_bar)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setToolTip("Cancel all running and queued jobs.")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self._jobs.cancel_all)
+        progress_layout.addWidget(self.cancel_button)
+        layout.addLayout(progress_layout)
+
+        self.job_label = QLabel("Jobs: none running")
+        layout.addWidget(self.job_label)
+
     def _load_config(self):
         try:
             file_path, _ = QFileDialog.getOpenFileName(self, "Select Config File", "", "JSON Files (*.json);;All Files (*)")
             if file_path:
+                from steganography import Steganography # first use pulls in numpy and PIL
                 config = Steganography.load_config(file_path) # load config file
-                if self._validate_config(config): # validate config
+                if validate_config(config): # validate config
                     self.steganography = Steganography(config)
+                    self._config_json = json.dumps(config, sort_keys=True)
                     self._set_status_bar_color("green") # set status bar color to green
                     self.status_label.setText("Config Status: Loaded")
+                    self._update_capacity()
                 else: # if validation fails
                     self._set_status_bar_color("orange")
                     self.status_label.setText("Config Status: Invalid")
@@ -104,29 +130,13 @@ class EmbeddingPage(QWidget):
         except Exception as e:
             self._show_error_message(f"Error loading config: {e}.\nMake sure the file is a valid JSON file.")
 
-    def _validate_config(self, config):
-        # required confg checks
-        required_keys = ["algorithm", "encryption", "noise_level"]
-        valid_algorithms = ["X Significant Bit", "Pixel Value Differencing"]
-        valid_encryptions = ["None", "Base64", "AES"]
-        
-        for key in required_keys:
-            if key not in config:
-                return False
-        if config["algorithm"] not in valid_algorithms:
-            return False
-        if config["encryption"] not in valid_encryptions:
-            return False
-        if config["encryption"] == "AES" and ("key" not in config or "iv" not in config):
-            return False
-        if config["algorithm"] == "X Significant Bit" and "bit_position" not in config:
-            return False
-        return True # all config checks passed
-
     def _unload_config(self):
         self.steganography = None # set steganography object to None to unload config
+        self._config_json = None
+        self._stego_result = None
         self._set_status_bar_color("red") # set status bar color to red
         self.status_label.setText("Config Status: Unloaded")
+        self._update_capacity()
 
     def _set_status_bar_color(self, color):
         palette = self.status_bar.palette() # get palette
@@ -139,36 +149,114 @@ class EmbeddingPage(QWidget):
             file_path, _ = QFileDialog.getOpenFileName(self, "Select Image", "", "Images (*.png *.jpg *.bmp)") # filter file directory by image files
             if file_path:
                 self.image_path.setText(file_path) # set image path in input field
-                pixmap = QPixmap(file_path) # create pixmap from image
-                self.original_scene.addPixmap(pixmap) # add pixmap to scene
+                self.capacity_label.setText("Capacity: loading image")
+                from .preview import load_cover
+                worker = self._jobs.submit(load_cover, file_path) # decoded once on a pool thread, the embed reuses the same pixels
+                worker.signals.progress.connect(self._show_progress)
+                worker.signals.finished.connect(lambda pixels, path=file_path: self._show_cover(path, pixels))
+                worker.signals.error.connect(lambda e: self._show_error_message(f"Error browsing image: {e}.\nMake sure the file is an image."))
         except Exception as e:
             self._show_error_message(f"Error browsing image: {e}.\nMake sure the file is an image.")
 
-    def _save_stego_image(self):
+    def _show_cover(self, image_path, pixels):
+        if image_path != self.image_path.text(): # another image was chosen while this one loaded
+            return
+        from .preview import to_pixmap
+        self.original_scene.addPixmap(to_pixmap(pixels)) # add pixmap to scene
+        self._update_capacity() # the cover is cached now, so the capacity job does not decode it again
+
+    def _update_capacity(self): # show how much text fits before anything is embedded
+        image_path = self.image_path.text()
+        if not self.steganography or not image_path:
+            self.capacity_label.setText("Capacity: load an image and config")
+            return
+        self.capacity_label.setText("Capacity: calculating")
+        request = (self.steganography, image_path)
+        worker = self._jobs.submit(self._capacity, self.steganography, image_path) # pvd capacity scans every pixel pair
+        worker.signals.finished.connect(lambda capacity, request=request: self._show_capacity(request, f"{capacity} bytes of text"))
+        worker.signals.error.connect(lambda e, request=request: self._show_capacity(request, f"unavailable ({e})"))
+        worker.signals.cancelled.connect(lambda request=request: self._show_capacity(request, "cancelled"))
+
+    @staticmethod
+    def _capacity(steganography, image_path, progress=None): # runs on a pool thread
+        return steganography.capacity(image_path)
+
+    def _show_capacity(self, request, text):
+        if request != (self.steganography, self.image_path.text()): # config or image changed since, a newer job is on its way
+            return
+        self.capacity_label.setText(f"Capacity: {text}")
+
+    def _result_key(self, image_path, text): # identifies an embed result, None if the cover can't be checked
         try:
-            file_path, _ = QFileDialog.getSaveFileName(self, "Save Stego Image", "", "Images (*.png *.jpg *.bmp)")
-            if file_path and self.steganography:
-                image_path = self.image_path.text() # get image path
-                text = self.embed_text_input.text() # get text to embed
-                stego_image = self.steganography.embed_text(image_path, text) # embed text in image
-                self.steganography.save_image(stego_image, file_path) # save stego image
-                pixmap = QPixmap(file_path) # create pixmap from stego image
-                self.stego_scene.addPixmap(pixmap) # add pixmap to scene
-        except Exception as e:
-            self._show_error_message(f"Error saving stego image: {e}.\nMake sure the file path is valid.")
+            stat = os.stat(image_path)
+        except OSError:
+            return None # the job itself reports the error
+        return (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, text, self._config_json)
+
+    def _cached_result(self, key):
+        if key is not None and self._stego_result and self._stego_result[0] == key:
+            return self._stego_result[1]
+        return None
+
+    def _save_stego_image(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Stego Image", "", "Images (*.png *.jpg *.bmp)")
+        if file_path and self.steganography:
+            image_path = self.image_path.text() # get image path
+            text = self.embed_text_input.text() # get text to embed
+            key = self._result_key(image_path, text)
+            stego_pixels = self._cached_result(key)
+            if stego_pixels is not None: # previewed with the same cover, text and config, only encoding is left
+                worker = self._jobs.submit(self._save_cached, self.steganography, stego_pixels, file_path)
+            else:
+                worker = self._jobs.submit(self._embed_and_save, self.steganography, image_path, text, file_path)
+            worker.signals.progress.connect(self._show_progress)
+            worker.signals.finished.connect(lambda stego_pixels, key=key: self._show_stego_image(stego_pixels, key))
+            worker.signals.error.connect(lambda e: self._show_error_message(f"Error saving stego image: {e}.\nMake sure the file path is valid."))
+            worker.signals.cancelled.connect(lambda: self.job_label.setText("Jobs: save cancelled"))
+
+    @staticmethod
+    def _embed_and_save(steganography, image_path, text, file_path, progress=None): # runs on a pool thread
+        stego_pixels = steganography.embed_text_array(image_path, text, progress) # embed text in image
+        steganography.save_image(stego_pixels, file_path) # save stego image
+        return stego_pixels
+
+    @staticmethod
+    def _save_cached(steganography, stego_pixels, file_path, progress=None):
+        progress(0.0, "Saving")
+        steganography.save_image(stego_pixels, file_path) # save stego image
+        progress(1.0, "Done")
+        return stego_pixels
 
     def _embed_data(self):
-        try: # try embedding data
-            if self.steganography:
-                image_path = self.image_path.text()
-                text = self.embed_text_input.text()
-                stego_image = self.steganography.embed_text(image_path, text)
-                self.stego_scene.clear() # clear scene
-                stego_qimage = ImageQt(stego_image.convert("RGBA")) # convert image to RGBA
-                stego_pixmap = QPixmap.fromImage(stego_qimage) # create pixmap from image
-                self.stego_scene.addPixmap(stego_pixmap) # add pixmap to scene
-        except Exception as e:
-            self._show_error_message(f"Error embedding data: {e}.\nMake sure your config file is correct.")
+        if self.steganography:
+            image_path = self.image_path.text()
+            text = self.embed_text_input.text()
+            key = self._result_key(image_path, text)
+            stego_pixels = self._cached_result(key)
+            if stego_pixels is not None: # nothing changed since the last embed
+                self._show_stego_image(stego_pixels, key)
+                return
+            worker = self._jobs.submit(self.steganography.embed_text_array, image_path, text) # queued behind any running jobs
+            worker.signals.progress.connect(self._show_progress)
+            worker.signals.finished.connect(lambda stego_pixels, key=key: self._show_stego_image(stego_pixels, key))
+            worker.signals.error.connect(lambda e: self._show_error_message(f"Error embedding data: {e}.\nMake sure your config file is correct."))
+            worker.signals.cancelled.connect(lambda: self.job_label.setText("Jobs: embedding cancelled"))
+
+    def _show_stego_image(self, stego_pixels, key=None): # preview straight from the stego array the embed returned
+        if key is not None:
+            self._stego_result = (key, stego_pixels)
+        self.stego_scene.clear() # clear scene
+        from .preview import to_pixmap # deferred, numpy is only needed once there is a result to show
+        stego_pixmap = to_pixmap(stego_pixels) # the array itself is wrapped as a QImage, no PIL or rgba copy
+        self.stego_scene.addPixmap(stego_pixmap) # add pixmap to scene
+
+    def _show_progress(self, percent, stage):
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"{stage} %p%")
+
+    def _update_job_status(self, pending):
+        self.cancel_button.setEnabled(pending > 0)
+        self.job_label.setText(f"Jobs: {pending} running or queued" if pending else "Jobs: none running")
 
     def _paste_text(self):
         clipboard_text = pyperclip.paste() # get text from clipboard
@@ -1,8 +1,12 @@
+import importlib
 from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QTabWidget
-from .encoding_page import EmbeddingPage
-from .conversion_page import ConversionPage
-from .config_page import ConfigPage
-from .decoding_page import DecodingPage
+from PyQt6.QtCore import QTimer
+
+# (tab title, module in this package, page class), pages are imported and built when their tab is first shown
+PAGES = (("Embed Data", "encoding_page", "EmbeddingPage"),
+         ("Decode Data", "decoding_page", "DecodingPage"),
+         ("Config Generator", "config_page", "ConfigPage"),
+         ("Image Conversion", "conversion_page", "ConversionPage"))
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -15,14 +19,20 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
         self.layout.addWidget(self.tabs) # tab widget for different pages
         
-        # create pages with linked python files
-        self.embedding_page = EmbeddingPage()
-        self.conversion_page = ConversionPage()
-        self.config_page = ConfigPage()
-        self.decoding_page = DecodingPage()
-        
-        # add pages to tab widget
-        self.tabs.addTab(self.embedding_page, "Embed Data")
-        self.tabs.addTab(self.decoding_page, "Decode Data")
-        self.tabs.addTab(self.config_page, "Config Generator")
-        self.tabs.addTab(self.conversion_page, "Image Conversion")
\ No newline at end of file
+        self.pages = {} # tab index -> page, filled as tabs are first activated
+        for title, _, _ in PAGES:
+            placeholder = QWidget() # empty host until the page is built
+            QVBoxLayout(placeholder).setContentsMargins(0, 0, 0, 0)
+            self.tabs.addTab(placeholder, title)
+        self.tabs.currentChanged.connect(self.ensure_page)
+        QTimer.singleShot(0, lambda: self.ensure_page(self.tabs.currentIndex())) # first page right after the window is shown
+
+    def ensure_page(self, index): # builds the page of a tab on first use, returns it
+        if index in self.pages or not 0 <= index < len(PAGES):
+            return self.pages.get(index)
+        _, module_name, class_name = PAGES[index]
+        module = importlib.import_module(f".{module_name}", __package__)
+        page = getattr(module, class_name)()
+        self.tabs.widget(index).layout().addWidget(page)
+        self.pages[index] = page
+        return page
@@ -0,0 +1,27 @@
+import numpy as np
+from PyQt6.QtGui import QImage, QPixmap
+
+# previews straight from decoded pixel arrays: the array is wrapped as a QImage in place (no rgba conversion,
+# no PIL round trip), and the cover array is the same cached one the embedding engine reads, see cache.py
+
+FORMATS = {1: QImage.Format.Format_Grayscale8, 3: QImage.Format.Format_RGB888, 4: QImage.Format.Format_RGBA8888}
+
+def to_qimage(pixels): # (height, width[, channels]) uint8 array as a QImage sharing its memory, keep pixels alive while it is used
+    pixels = np.ascontiguousarray(pixels) # no copy for arrays that already are, row padding is carried by the stride
+    height, width = pixels.shape[:2]
+    channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+    if pixels.dtype != np.uint8 or channels not in FORMATS:
+        raise ValueError(f"Unsupported pixel layout for preview: {pixels.dtype} with {channels} channels")
+    image = QImage(pixels.data, width, height, pixels.strides[0], FORMATS[channels])
+    image.pixels = pixels # the QImage does not own the buffer
+    return image
+
+def to_pixmap(pixels): # the one copy into the display's native format
+    return QPixmap.fromImage(to_qimage(pixels))
+
+def load_cover(image_path, progress=None): # runs on a pool thread, the gui thread turns the pixels into a pixmap with to_pixmap
+    from cache import load_pixels # shared decoded-cover cache, embedding the same file then skips decoding
+    progress(0.0, "Loading image")
+    pixels = load_pixels(image_path)
+    progress(1.0, "Done")
+    return pixels
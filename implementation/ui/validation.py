@@ -0,0 +1,31 @@
+# config checks shared by the config, encoding and decoding pages, imports nothing heavy so pages stay cheap to build
+
+def validate_config(config):
+    # config requirements
+    required_keys = ["algorithm", "encryption", "noise_level"]
+    valid_algorithms = ["X Significant Bit", "Pixel Value Differencing"]
+    valid_encryptions = ["None", "Base64", "AES"]
+
+    for key in required_keys:
+        if key not in config:
+            return False
+    if config["algorithm"] not in valid_algorithms:
+        return False
+    if config["encryption"] not in valid_encryptions:
+        return False
+    if config["encryption"] == "AES" and ("key" not in config or "iv" not in config):
+        return False
+    if config["encryption"] == "AES" and config.get("aes_mode", "CBC") not in ["CBC", "CTR"]:
+        return False
+    if config["algorithm"] == "X Significant Bit" and "bit_position" not in config:
+        return False
+    if config.get("bits_per_channel") not in [None, 1, 2, 3, 4]:
+        return False
+    if not isinstance(config.get("scatter_key", ""), str):
+        return False
+    if config.get("compression", "None") not in ["None", "zlib", "lzma", "bz2"]:
+        return False
+    limit = config.get("decompression_limit")
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0):
+        return False
+    return True # all config checks passed
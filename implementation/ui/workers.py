@@ -0,0 +1,70 @@
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+# background jobs for the pages: the work runs on QThreadPool threads, results come back to the gui thread as signals
+
+class WorkerSignals(QObject): # QRunnable is not a QObject, so the signals live on a companion object
+    progress = pyqtSignal(int, str) # percent, stage
+    finished = pyqtSignal(object) # return value of the job
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+class Worker(QRunnable):
+    def __init__(self, function, *args, **kwargs): # function is called with a progress=callable(fraction, stage) keyword
+        super().__init__()
+        self._function = function
+        self._args = args
+        self._kwargs = kwargs
+        self._cancelled = False
+        self.signals = WorkerSignals()
+
+    def cancel(self): # takes effect at the job's next progress report, queued jobs stop before starting
+        self._cancelled = True
+
+    def _progress(self, fraction, stage):
+        if self._cancelled and fraction < 1.0: # finished work is kept rather than discarded at its last report
+            from steganography import OperationCancelled
+            raise OperationCancelled(f"Cancelled during: {stage}")
+        self.signals.progress.emit(int(fraction * 100), stage)
+
+    def run(self):
+        from steganography import OperationCancelled # imported on the pool thread, gui startup stays free of numpy and PIL
+        try:
+            if self._cancelled:
+                raise OperationCancelled("Cancelled before starting")
+            result = self._function(*self._args, progress=self._progress, **self._kwargs)
+        except OperationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+class JobQueue(QObject): # per page list of running and queued workers, shared thread pool
+    changed = pyqtSignal(int) # number of jobs still pending
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool.globalInstance()
+        self._workers = []
+
+    def submit(self, function, *args, **kwargs): # returns the worker so callers can connect its signals
+        worker = Worker(function, *args, **kwargs)
+        worker.setAutoDelete(False) # kept alive by self._workers until its final signal arrives
+        for signal in (worker.signals.finished, worker.signals.error, worker.signals.cancelled):
+            signal.connect(lambda *_, worker=worker: self._remove(worker))
+        self._workers.append(worker)
+        self._pool.start(worker)
+        self.changed.emit(len(self._workers))
+        return worker
+
+    def cancel_all(self):
+        for worker in self._workers:
+            worker.cancel()
+
+    def pending(self):
+        return len(self._workers)
+
+    def _remove(self, worker):
+        if worker in self._workers:
+            self._workers.remove(worker)
+            self.changed.emit(len(self._workers))